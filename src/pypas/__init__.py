@@ -3,5 +3,6 @@ from .lib import sysutils  # noqa
 from .lib.exercise import Exercise  # noqa
 from .lib.auth import User  # noqa
 from .lib.config import Config  # noqa
+from .lib.workspace import Workspace  # noqa
 from .lib import network  # noqa
 from .lib.monads import Monad  # noqa
@@ -1,8 +1,14 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from urllib.parse import urljoin
 
-import requests
 from pypas import settings
 
+from . import network
+from .config import Config
 from .console import console
 
 
@@ -11,21 +17,61 @@ class User:
         self.token = token
         self.auth_url = urljoin(settings.PYPAS_AUTH_URLPATH, token + '/')
 
+    @property
+    def token_digest(self) -> str:
+        # Validation record refers to a token without storing it twice
+        return hashlib.sha256(self.token.encode()).hexdigest()
+
     def authenticate(self) -> bool:
         with console.status(f'[dim]Authenticating user at: [italic]{self.auth_url}'):
-            try:
-                response = requests.get(self.auth_url)
-                response.raise_for_status()
-            except Exception as err:
-                console.error(err)
-                return False
-            if (data := response.json())['success']:
-                payload = data['payload']
-                console.success(
-                    f'Congratulations [i]{payload["username"]}[/i]. You have been successfully authenticated'
-                )
-                console.debug(f'You have been enrolled in the context [b]{payload["context"]}')
-                return True
-            else:
-                console.error(data['payload'])
-                return False
+            monad = network.get(self.auth_url)
+        if monad:
+            payload = monad.payload
+            console.success(
+                f'Congratulations [i]{payload["username"]}[/i]. You have been successfully authenticated'
+            )
+            console.debug(f'You have been enrolled in the context [b]{payload["context"]}')
+            self.save_validation(payload, valid=True)
+            return True
+        else:
+            console.error(monad.payload)
+            return False
+
+    def cached_validation(self) -> bool | None:
+        """Validity of token as recorded at main config (None if unknown or expired)."""
+        record = Config().get('auth') or {}
+        if record.get('token_digest') != self.token_digest:  # type: ignore
+            return None
+        if time.time() - record.get('validated_at', 0) > settings.TOKEN_VALIDATION_TTL:  # type: ignore
+            return None
+        return record.get('valid')  # type: ignore
+
+    def save_validation(self, payload: dict, valid: bool) -> None:
+        record = dict(token_digest=self.token_digest, validated_at=time.time(), valid=valid)
+        if valid:
+            record.update(username=payload['username'], context=payload['context'])
+        Config().save(quiet=True, auth=record)
+
+    def validate(self) -> bool | None:
+        """Check token against server (cached for TOKEN_VALIDATION_TTL seconds).
+        Returns None if it could not be checked (i.e. server is unreachable)."""
+        if (valid := self.cached_validation()) is not None:
+            return valid
+        if monad := network.get(self.auth_url):
+            self.save_validation(monad.payload, valid=True)
+            return True
+        if isinstance(monad.payload, Exception):
+            return None
+        self.save_validation(monad.payload, valid=False)
+        return False
+
+    def validate_in_background(self) -> Future:
+        """Token validation running concurrently (i.e. while zipping an exercise)."""
+        if (valid := self.cached_validation()) is not None:
+            future: Future = Future()
+            future.set_result(valid)
+            return future
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self.validate)
+        executor.shutdown(wait=False)
+        return future
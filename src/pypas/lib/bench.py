@@ -0,0 +1,182 @@
+import fnmatch
+import statistics
+import time
+import tracemalloc
+
+import pytest
+
+try:
+    # Private API (see renew_fixtures)
+    from _pytest.tmpdir import tmppath_result_key
+except ImportError:  # pragma: no cover
+    tmppath_result_key = None
+
+from pypas import settings
+
+MB = 1024 * 1024
+
+
+def calibrate(rounds: int = 5) -> float:
+    """Time (median) of a fixed CPU-bound loop. Used to normalize time budgets across machines."""
+
+    def loop() -> float:
+        start = time.perf_counter()
+        sum(i * i for i in range(200_000))
+        return time.perf_counter() - start
+
+    return statistics.median(loop() for _ in range(rounds))
+
+
+def can_renew_fixtures(item: pytest.Item) -> bool:
+    """Fixtures are renewed through pytest internals, which could change in future releases."""
+    setupstate = getattr(item.session, '_setupstate', None)
+    return isinstance(getattr(setupstate, 'stack', None), dict) and hasattr(item, '_initrequest')
+
+
+def renew_fixtures(item: pytest.Item) -> None:
+    """Tear down and set up again the function-scoped fixtures of item (i.e. a new tmp_path),
+    so that each round runs as a new test. Fixtures of wider scopes are kept."""
+    if tmppath_result_key is not None:
+        # Previous round passed: tmp_path teardown expects the report that pytest records
+        item.stash.setdefault(tmppath_result_key, {})['call'] = True
+    setupstate = item.session._setupstate
+    finalizers, _ = setupstate.stack.pop(item)
+    for finalizer in reversed(finalizers):
+        finalizer()
+    item._initrequest()  # type: ignore
+    setupstate.setup(item)
+
+
+def timed_run(item: pytest.Item) -> float:
+    renew_fixtures(item)
+    start = time.perf_counter()
+    item.runtest()
+    return time.perf_counter() - start
+
+
+class BenchResult:
+    def __init__(self, nodeid: str, times: list[float], peak_memory: int, retained_blocks: int):
+        self.nodeid = nodeid
+        self.times = times
+        self.peak_memory = peak_memory  # bytes
+        self.retained_blocks = retained_blocks  # memory blocks still alive after the call
+        self.failures: list[str] = []
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def iqr(self) -> float:
+        if len(self.times) < 2:
+            return 0.0
+        q1, _, q3 = statistics.quantiles(self.times, n=4)
+        return q3 - q1
+
+    def __str__(self):
+        return (
+            f'median {self.median * 1000:.3f}ms · IQR {self.iqr * 1000:.3f}ms · '
+            f'peak {self.peak_memory / MB:.2f} MB · {self.retained_blocks} retained blocks'
+        )
+
+
+class BenchPlugin:
+    """Pytest plugin which checks performance budgets declared at table [bench] of exercise
+    config. Budgets are keyed by a pattern (fnmatch) of test node id or test function name:
+
+        [bench]
+        warmup = 3
+        rounds = 20
+
+        [bench.budgets."test_main.py::test_sort*"]
+        max_time = 0.01        # seconds (median)
+        max_peak_memory = 5    # MB
+        max_retained_blocks = 1000 # memory blocks still alive after each call
+
+    Time budgets refer to a machine where the calibration loop takes "reference" seconds.
+    Every round gets fresh function-scoped fixtures.
+    """
+
+    def __init__(self, config: dict):
+        self.budgets: dict[str, dict] = config.get('budgets', {})
+        self.warmup: int = config.get('warmup', settings.BENCH_WARMUP_ROUNDS)
+        self.rounds: int = max(config.get('rounds', settings.BENCH_ROUNDS), 1)
+        self.reference: float = config.get('reference', settings.BENCH_CALIBRATION_REFERENCE)
+        self.factor = 1.0
+        self.results: list[BenchResult] = []
+        # Tests with budgets which could not be measured (unsupported pytest version)
+        self.unmeasured: list[str] = []
+
+    def budget_for(self, item: pytest.Item) -> dict | None:
+        for pattern, budget in self.budgets.items():
+            if fnmatch.fnmatch(item.nodeid, pattern) or fnmatch.fnmatch(item.name, pattern):
+                return budget
+        return None
+
+    def pytest_sessionstart(self, session: pytest.Session) -> None:
+        if self.budgets:
+            self.factor = calibrate() / self.reference
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item):
+        # Only correct tests (the ones which do not raise) are measured
+        result = yield
+        if (budget := self.budget_for(item)) is not None:
+            if can_renew_fixtures(item):
+                self.check(item, budget)
+            else:
+                self.unmeasured.append(item.nodeid)
+        return result
+
+    def check(self, item: pytest.Item, budget: dict) -> None:
+        for _ in range(self.warmup):
+            timed_run(item)
+        times = [timed_run(item) for _ in range(self.rounds)]
+        renew_fixtures(item)
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            item.runtest()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        retained_blocks = sum(
+            max(stat.count_diff, 0) for stat in after.compare_to(before, 'lineno')
+        )
+
+        result = BenchResult(item.nodeid, times, peak_memory, retained_blocks)
+        if (max_time := budget.get('max_time')) is not None:
+            if result.median > (limit := max_time * self.factor):
+                result.failures.append(f'median time {result.median:.6f}s > {limit:.6f}s')
+        if (max_peak_memory := budget.get('max_peak_memory')) is not None:
+            if result.peak_memory > max_peak_memory * MB:
+                result.failures.append(
+                    f'peak memory {result.peak_memory / MB:.2f} MB > {max_peak_memory} MB'
+                )
+        if (max_retained_blocks := budget.get('max_retained_blocks')) is not None:
+            if result.retained_blocks > max_retained_blocks:
+                result.failures.append(
+                    f'retained blocks {result.retained_blocks} > {max_retained_blocks}'
+                )
+        self.results.append(result)
+        if result.failures:
+            pytest.fail(f'Performance budget exceeded: {", ".join(result.failures)}', pytrace=False)
+
+    def pytest_terminal_summary(self, terminalreporter) -> None:
+        if not self.results and not self.unmeasured:
+            return
+        terminalreporter.write_sep('=', 'pypas bench')
+        if self.unmeasured:
+            terminalreporter.write_line(
+                f'Benchmarks are not supported with pytest {pytest.__version__}: '
+                f'{len(self.unmeasured)} tests were not measured',
+                yellow=True,
+            )
+        terminalreporter.write_line(f'Calibration factor: {self.factor:.2f}')
+        for result in self.results:
+            if result.failures:
+                terminalreporter.write('FAIL ', red=True, bold=True)
+            else:
+                terminalreporter.write('PASS ', green=True, bold=True)
+            terminalreporter.write_line(f'{result.nodeid} ({result})')
@@ -1,29 +1,55 @@
+import copy
+import os
+import sys
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 import toml
 
 from pypas import console, settings
 
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+# Parsed TOML files: {path: ((mtime, size), data)}
+_toml_cache: dict[Path, tuple[tuple[int, int], dict]] = {}
+_toml_cache_lock = threading.Lock()
+
+
+def load_toml(path: str | Path) -> dict:
+    """Parse a TOML file. Parsed contents are reused (within the same process) as long as the
+    file keeps its modification time and size."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _toml_cache_lock:
+        if (cached := _toml_cache.get(path)) is None or cached[0] != key:
+            with open(path, 'rb') as f:
+                cached = _toml_cache[path] = (key, tomllib.load(f))
+    return copy.deepcopy(cached[1])
+
 
 class Config:
-    def __init__(self, path: Path = settings.MAIN_CONFIG_FILE):
-        self.path = path
+    def __init__(self, path: Path | None = None):
+        self.path = path or settings.MAIN_CONFIG_FILE
         self.load()
 
     def load(self) -> dict:
         try:
-            with open(self.path) as f:
-                self.data = toml.load(f)
+            self.data = load_toml(self.path)
         except FileNotFoundError:
             self.data = {}
         return self.data
 
-    def save(self, **kwargs) -> None:
+    def save(self, quiet: bool = False, **kwargs) -> None:
         for key, value in kwargs.items():
             self[key] = value
-        action = 'updated' if self.exists() else 'created'
-        console.info(f'Config file has been {action}: [note]{self.path}')
+        if not quiet:
+            action = 'updated' if self.exists() else 'created'
+            console.info(f'Config file has been {action}: [note]{self.path}')
         with open(self.path, 'w') as f:
             toml.dump(self.data, f)
 
@@ -43,14 +69,27 @@ class Config:
     def unauth():
         settings.MAIN_CONFIG_FILE.unlink(missing_ok=True)
 
+    @staticmethod
+    def find_nested_configs(
+        root: Path = Path('.'), config_file: str = settings.EXERCISE_CONFIG_FILE
+    ) -> Iterator[Path]:
+        """Folders (below root) containing an exercise config file. State dirs of exercises
+        (snapshots, venvs...) are not explored, and main config is not taken as an exercise."""
+        base = root.resolve()
+        main_config = settings.MAIN_CONFIG_FILE.resolve()
+        for dirpath, dirs, files in os.walk(base):
+            dirs[:] = sorted(d for d in dirs if d != settings.EXERCISE_STATE_DIR)
+            folder = Path(dirpath)
+            if folder != base and config_file in files and folder / config_file != main_config:
+                yield folder
+
     @staticmethod
     def find_nested_config(
         config_file: str = settings.EXERCISE_CONFIG_FILE, relative_to_cwd: bool = False
     ) -> Path | None:
         base = Path('.').resolve()
-        for path in base.rglob(config_file):
-            if (p := path.parent) != base:
-                return p if not relative_to_cwd else p.relative_to(base)
+        for p in Config.find_nested_configs(base, config_file):
+            return p if not relative_to_cwd else p.relative_to(base)
         return None
 
     @staticmethod
@@ -1,17 +1,9 @@
+import contextlib
 import functools
+import json
 import re
-
-from rich.console import Console
-from rich.progress import (
-    BarColumn,
-    DownloadColumn,
-    TextColumn,
-    TimeRemainingColumn,
-    TransferSpeedColumn,
-)
-from rich.prompt import Confirm
-from rich.table import Table
-from rich.theme import Theme
+import sys
+import threading
 
 STYLES = {
     'info': '',
@@ -23,76 +15,183 @@ STYLES = {
     'highlight': 'bold magenta',
 }
 
-PROGRESS_ITEMS = (
-    TextColumn('[bold blue]{task.fields[filename]}'),
-    BarColumn(),
-    '[progress.percentage]{task.percentage:>3.1f}%',
-    '•',
-    DownloadColumn(),
-    '•',
-    TransferSpeedColumn(),
-    '•',
-    TimeRemainingColumn(),
-)
+# Same tag syntax as rich markup: https://rich.readthedocs.io/en/latest/markup.html
+MARKUP_TAG = re.compile(r'(?<!\\)\[([a-z#/@][^[]*?)]')
 
-custom_theme = Theme(STYLES)
 
+def strip_markup(text: str) -> str:
+    return MARKUP_TAG.sub('', text)
 
-class CustomConsole(Console):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
 
-    def check(self, msg: str = '') -> None:
-        if msg:
-            msg = f'{msg} '
-        self.print(f'{msg}[success]✔')
+class OutputMode:
+    RICH = 'rich'
+    JSON = 'json'
+    QUIET = 'quiet'
 
-    def fail(self, msg: str = '') -> None:
-        if msg:
-            msg = f'{msg} '
-        self.print(f'{msg}[error]✘')
 
-    def resolve(self, msg: str = '', status=None) -> None:
-        match status:
-            case True:
-                self.check(msg)
-            case False:
-                self.fail(msg)
-            case _:
-                self.print(f'{msg}[highlight]?')
+class MutableOutput:
+    """Output from a thread can be muted. Expects a threading.local() at self._local."""
+
+    @contextlib.contextmanager
+    def muted(self):
+        """Silence output from the current thread. Yields the list of (style, text) messages
+        that would have been printed."""
+        self._local.messages = messages = []
+        try:
+            yield messages
+        finally:
+            self._local.messages = None
+
+    def is_muted(self) -> bool:
+        return getattr(self._local, 'messages', None) is not None
+
+
+class PlainTable:
+    def __init__(self, *columns):
+        self.columns = [column if isinstance(column, str) else column[0] for column in columns]
+        self.rows: list[list[str]] = []
+
+    def add_row(self, *values: str) -> None:
+        self.rows.append([strip_markup(str(value)) for value in values])
+
+
+class JSONConsole(MutableOutput):
+    """Console for scripted use: every output is a compact JSON event (one per line).
+    It does not depend on rich."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **data) -> None:
+        if self.is_muted():
+            self._local.messages.append((data.get('level', ''), data.get('text', '')))
+            return
+        self.write(event, data)
+
+    def write(self, event: str, data: dict) -> None:
+        line = json.dumps(dict(event=event, **data), ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(f'{line}\n')
+            self.stream.flush()
+
+    def print(self, *objects, style=None, **kwargs) -> None:
+        for obj in objects:
+            if isinstance(obj, PlainTable):
+                self.emit('table', columns=obj.columns, rows=obj.rows)
+            else:
+                self.emit('message', level=style or 'info', text=strip_markup(str(obj)))
 
     def message(self, msg: str, style: str, *args, emphasis=False, cr=True, **kwargs):
-        if not isinstance(msg, str):
-            msg = str(msg)
-        if emphasis and not re.search(r'(https?://\S+)|\)$', msg):
-            msg += '!'
-        end = '\n' if cr else ' '
-        self.print(msg, *args, style=style, end=end, **kwargs)
+        self.emit('message', level=style, text=strip_markup(str(msg)))
 
     info = functools.partialmethod(message, style='info')
     error = functools.partialmethod(message, style='error')
     success = functools.partialmethod(message, style='success')
     warning = functools.partialmethod(message, style='warning')
-    debug = functools.partialmethod(message, style='dim')
+    debug = functools.partialmethod(message, style='debug')
     quote = functools.partialmethod(message, style='quote')
     note = functools.partialmethod(message, style='note')
     highlight = functools.partialmethod(message, style='highlight')
 
+    def resolve(self, msg: str = '', status=None) -> None:
+        self.emit('check', text=strip_markup(msg), status=status)
+
+    def check(self, msg: str = '') -> None:
+        self.resolve(msg, True)
+
+    def fail(self, msg: str = '') -> None:
+        self.resolve(msg, False)
+
     def confirm(self, prompt_text: str, default: bool = True, **kwargs) -> bool:
-        return Confirm.ask(prompt_text, default=default, **kwargs)
+        # Non-interactive: default answer is always taken
+        self.emit('confirm', text=strip_markup(prompt_text), answer=default)
+        return default
 
+    @contextlib.contextmanager
+    def status(self, status: str, *args, **kwargs):
+        self.emit('status', text=strip_markup(status))
+        yield
 
-class CustomTable(Table):
-    def __init__(self, *columns):
-        super().__init__()
-        for column in columns:
-            if isinstance(column, str):
-                name = column
-                style = ''
-            else:
-                # iterable is expected!
-                name, style = column
-            self.add_column(name, style=style)
+    def table(self, *columns) -> PlainTable:
+        return PlainTable(*columns)
+
+    def panel(self, text: str, style: str = '') -> None:
+        self.emit('panel', text=strip_markup(text))
 
+    @contextlib.contextmanager
+    def progress(self, filename: str, total: int, steps: int = 10):
+        """Progress events for a file transfer (at most "steps" of them plus the last one).
+        Yields a function to advance it."""
+        completed = 0
+        next_step = 0
 
-console = CustomConsole(theme=custom_theme, highlight=False)
+        def advance(size: int) -> None:
+            nonlocal completed, next_step
+            completed += size
+            if total and completed * steps >= next_step * total:
+                self.emit('progress', filename=filename, completed=completed, total=total)
+                next_step = completed * steps // total + 1
+
+        yield advance
+        self.emit('progress', filename=filename, completed=completed, total=total, done=True)
+
+
+class QuietConsole(JSONConsole):
+    """Console which only shows error messages (as plain text on stderr)."""
+
+    def write(self, event: str, data: dict) -> None:
+        if event == 'message' and data.get('level') == 'error':
+            print(data['text'], file=sys.stderr)
+
+    def confirm(self, prompt_text: str, default: bool = True, **kwargs) -> bool:
+        # Default answer can't be taken silently: it may be the one stopping the command
+        prompt = f'{strip_markup(prompt_text)} [{"Y/n" if default else "y/N"}]: '
+        if not sys.stdin.isatty():
+            if default:
+                return default
+            print(f'{prompt}aborted (no terminal to answer)', file=sys.stderr)
+            raise SystemExit(1)
+        while True:
+            print(prompt, end='', file=sys.stderr, flush=True)
+            match sys.stdin.readline().strip().lower():
+                case '':
+                    return default
+                case 'y' | 'yes':
+                    return True
+                case 'n' | 'no':
+                    return False
+
+
+class ConsoleProxy:
+    """Console for the active output mode. It is created on first use, so rich modules are only
+    imported when rich output is actually needed."""
+
+    def __init__(self, mode: str = OutputMode.RICH):
+        self.mode = mode
+        self._console = None
+
+    def set_mode(self, mode: str) -> None:
+        self.mode = mode
+        self._console = None
+
+    @property
+    def target(self):
+        if self._console is None:
+            match self.mode:
+                case OutputMode.JSON:
+                    self._console = JSONConsole()
+                case OutputMode.QUIET:
+                    self._console = QuietConsole()
+                case _:
+                    from .richconsole import CustomConsole, custom_theme
+
+                    self._console = CustomConsole(theme=custom_theme, highlight=False)
+        return self._console
+
+    def __getattr__(self, name: str):
+        return getattr(self.target, name)
+
+
+console = ConsoleProxy()
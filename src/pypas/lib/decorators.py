@@ -3,32 +3,43 @@ import os
 
 from pypas import sysutils
 
+from .auth import User
 from .config import Config
 from .console import console
 from .exercise import Exercise
 
 
-def inside_exercise(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        if os.path.exists('.pypas.toml'):
-            return func(*args, **kwargs)
-        else:
-            console.error('Current folder does not seem to be a pypas exercise', emphasis=True)
-            console.info('Please [note]cd[/note] into the right folder.')
+def inside_exercise(_func=None, *, unless: str = ''):
+    """Ensure current folder is an exercise.
+    Check is omitted when the keyword argument given by "unless" is truthy."""
 
-    return wrapper
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if (unless and kwargs.get(unless)) or os.path.exists('.pypas.toml'):
+                return func(*args, **kwargs)
+            else:
+                console.error('Current folder does not seem to be a pypas exercise', emphasis=True)
+                console.info('Please [note]cd[/note] into the right folder.')
+
+        return wrapper
+
+    return decorator(_func) if _func else decorator
 
 
 def auth_required(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         config = Config()
-        if config.get('token'):
-            return func(*args, **kwargs)
-        else:
+        if not (token := config.get('token')):
             console.error('You must be authenticated before uploading any exercise', emphasis=True)
             console.info('Run [note]pypas auth --help[/note] for more information.')
+        elif User(token).cached_validation() is False:  # type: ignore
+            # Fast path: token was recently rejected by server (no request is needed)
+            console.error('Your access token is not valid (expired or revoked)', emphasis=True)
+            console.info('Run [note]pypas auth --help[/note] for more information.')
+        else:
+            return func(*args, **kwargs)
 
     return wrapper
 
@@ -0,0 +1,474 @@
+"""Local stand-in for the pypas server, meant for integration and performance testing.
+
+It implements the endpoints used by pypas-cli (see settings.py) with in-memory data, and it can
+simulate bad networks: latency per request, bandwidth throttling and failure injection.
+Binary responses support HTTP Range requests.
+
+Run it standalone:
+
+    python -m pypas.lib.devserver --port 8000 --latency 0.1 --bandwidth 500000
+
+Or use the pytest fixture "pypas_server" (which points pypas settings to it):
+
+    pytest_plugins = ['pypas.lib.devserver']
+"""
+
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zipfile
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urljoin, urlparse
+
+from pypas import settings
+
+from .snapshot import manifest_digest
+
+DEFAULT_TOKEN = 'devtoken'
+
+
+class DevServerState:
+    """In-memory data of the server."""
+
+    def __init__(self):
+        self.users = {DEFAULT_TOKEN: dict(username='student', context='devserver')}
+        self.frames = {'dev-frame': dict(name='Development frame', exercises=['hello', 'sum'])}
+        self.exercises = {
+            'hello': dict(
+                version='0.1.0',
+                topic='basics/intro',
+                files={
+                    'main.py': b"print('Hello, World!')\n",
+                    'docs/README.pdf': b'%PDF-1.4 dev docs\n',
+                    'tests/test_main.py': b'def test_main():\n    assert True\n',
+                },
+            ),
+            'sum': dict(
+                version='0.2.0',
+                topic='basics/math',
+                files={
+                    'main.py': b'def add(a, b):\n    ...\n',
+                    'tests/test_main.py': b'def test_add():\n    pass\n',
+                },
+            ),
+        }
+        # Uploaded assignments: {(token, slug): {path: contents}}
+        self.submissions: dict[tuple[str, str], dict[str, bytes]] = {}
+        self.lock = threading.Lock()
+
+    def exercise_bundle(self, slug: str, with_docs: bool = True) -> bytes:
+        exercise = self.exercises[slug]
+        config = f'slug = "{slug}"\nversion = "{exercise["version"]}"\n'
+        files = {settings.EXERCISE_CONFIG_FILE: config.encode(), **exercise['files']}
+        if not with_docs:
+            files = {path: data for path, data in files.items() if not path.startswith('docs/')}
+        return make_zip(files)
+
+    def docs_bundle(self, slug: str) -> bytes:
+        files = self.exercises[slug]['files']
+        return make_zip({path: data for path, data in files.items() if path.startswith('docs/')})
+
+
+def make_zip(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path, data in sorted(files.items()):
+            archive.writestr(path, data)
+    return buffer.getvalue()
+
+
+def read_zip(data: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return {
+            info.filename: archive.read(info) for info in archive.infolist() if not info.is_dir()
+        }
+
+
+def files_digest(files: dict[str, bytes]) -> str:
+    return manifest_digest({path: hashlib.sha256(data).hexdigest() for path, data in files.items()})
+
+
+class DevServerHandler(BaseHTTPRequestHandler):
+    server: 'DevServer'
+    protocol_version = 'HTTP/1.1'
+
+    ROUTES = (
+        ('GET', r'/access/auth/(?P<token>[^/]+)/', 'auth'),
+        ('POST', r'/exercises/get/(?P<slug>[^/]+)/', 'get_exercise'),
+        ('POST', r'/assignments/put/(?P<slug>[^/]+)/', 'put_assignment'),
+        ('POST', r'/assignments/put/(?P<slug>[^/]+)/delta/', 'put_delta'),
+        ('POST', r'/assignments/put/(?P<slug>[^/]+)/check/', 'put_check'),
+        ('POST', r'/assignments/log/', 'log'),
+        ('POST', r'/exercises/list/', 'list_exercises'),
+        ('POST', r'/assignments/pull/(?P<slug>[^/]+)/', 'pull'),
+        ('GET', r'/exercises/info/(?P<slug>[^/]+)/', 'info'),
+        ('POST', r'/exercises/info/', 'bulk_info'),
+        ('POST', r'/exercises/docs/(?P<slug>[^/]+)/', 'docs'),
+    )
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # Plumbing
+
+    def dispatch(self, method: str) -> None:
+        self.server.requests_count += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        path = urlparse(self.path).path
+        self.body = self.read_body()
+        if self.server.random.random() < self.server.failure_rate:
+            self.send_response(HTTPStatus.SERVICE_UNAVAILABLE)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        for route_method, pattern, handler in self.ROUTES:
+            if route_method == method and (match := re.fullmatch(pattern, path)):
+                if handler in self.server.disabled_endpoints:
+                    break
+                self.server.handled.append(handler)
+                getattr(self, handler)(**match.groupdict())
+                return
+        self.send_error(HTTPStatus.NOT_FOUND)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length', 0))
+        chunks = []
+        while length > 0:
+            chunk = self.rfile.read(min(length, self.server.chunk_size))
+            if not chunk:
+                break
+            self.throttle(len(chunk))
+            chunks.append(chunk)
+            length -= len(chunk)
+        return b''.join(chunks)
+
+    def throttle(self, size: int) -> None:
+        if self.server.bandwidth:
+            time.sleep(size / self.server.bandwidth)
+
+    def form(self) -> dict:
+        """Fields of urlencoded or multipart body. Uploaded files are given as bytes."""
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            headers = f'Content-Type: {content_type}\r\n\r\n'.encode()
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                headers + self.body
+            )
+            fields = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                data = part.get_payload(decode=True)
+                fields[name] = data if part.get_filename() else data.decode()
+            return fields
+        fields = parse_qs(self.body.decode())
+        return {key: values if len(values) > 1 else values[0] for key, values in fields.items()}
+
+    def send_json(self, success: bool, payload) -> None:
+        self.send_bytes(
+            json.dumps(dict(success=success, payload=payload)).encode(), 'application/json'
+        )
+
+    def send_bytes(self, data: bytes, content_type: str = 'application/zip') -> None:
+        start, end = 0, len(data) - 1
+        status = HTTPStatus.OK
+        if match := re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range', '')):
+            if match[1]:
+                start = int(match[1])
+                end = int(match[2]) if match[2] else end
+            elif match[2]:
+                start = max(len(data) - int(match[2]), 0)
+            if start > end or start >= len(data):
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            end = min(end, len(data) - 1)
+            status = HTTPStatus.PARTIAL_CONTENT
+        body = data[start : end + 1]
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.end_headers()
+        for i in range(0, len(body), self.server.chunk_size):
+            chunk = body[i : i + self.server.chunk_size]
+            self.throttle(len(chunk))
+            self.wfile.write(chunk)
+
+    def user(self, token: str | None) -> dict | None:
+        if (user := self.server.state.users.get(token or '')) is None:
+            self.send_json(False, 'Invalid token')
+        return user
+
+    # Endpoints
+
+    def auth(self, token: str) -> None:
+        if user := self.user(token):
+            self.send_json(True, user)
+
+    def get_exercise(self, slug: str) -> None:
+        fields = self.form()
+        if not self.user(fields.get('token')):
+            return
+        if slug not in self.server.state.exercises:
+            self.send_json(False, f'Exercise "{slug}" does not exist')
+            return
+        self.send_bytes(self.server.state.exercise_bundle(slug, fields.get('docs', '1') != '0'))
+
+    def put_assignment(self, slug: str) -> None:
+        fields = self.form()
+        if not self.user(token := fields.get('token')):
+            return
+        files = read_zip(fields['file'])
+        with self.server.state.lock:
+            self.server.state.submissions[(token, slug)] = files
+        self.send_json(True, f'Assignment "{slug}" was uploaded ({len(files)} files)')
+
+    def put_delta(self, slug: str) -> None:
+        fields = self.form()
+        if not self.user(token := fields.get('token')):
+            return
+        state = self.server.state
+        with state.lock:
+            current = state.submissions.get((token, slug))
+            if current is None or files_digest(current) != fields.get('base'):
+                self.send_json(False, 'Base submission does not match')
+                return
+            files = {**current, **read_zip(fields['file'])}
+            for path in json.loads(fields.get('deleted') or '[]'):
+                files.pop(path, None)
+            state.submissions[(token, slug)] = files
+        self.send_json(True, f'Assignment "{slug}" was uploaded ({len(files)} files)')
+
+    def put_check(self, slug: str) -> None:
+        fields = self.form()
+        if not self.user(token := fields.get('token')):
+            return
+        with self.server.state.lock:
+            current = self.server.state.submissions.get((token, slug))
+        digest = files_digest(current) if current is not None else None
+        uploaded = digest is not None and digest == fields.get('digest')
+        # A delta is accepted when it is based on the current submission
+        delta = digest is not None and digest == fields.get('base')
+        self.send_json(True, dict(uploaded=uploaded, delta=delta))
+
+    def log(self) -> None:
+        fields = self.form()
+        if not self.user(token := fields.get('token')):
+            return
+        state = self.server.state
+        payload = []
+        for frame_slug, frame in state.frames.items():
+            if fields.get('frame') and fields['frame'] != frame_slug:
+                continue
+            uploaded = [s for s in frame['exercises'] if (token, s) in state.submissions]
+            payload.append(
+                dict(
+                    name=frame['name'],
+                    slug=frame_slug,
+                    uploaded=len(uploaded),
+                    available=len(frame['exercises']),
+                    passed=len(uploaded),
+                    failed=0,
+                    waiting=0,
+                    assignments=[dict(slug=s, passed=True) for s in uploaded],
+                )
+            )
+        self.send_json(True, payload)
+
+    def list_exercises(self) -> None:
+        fields = self.form()
+        if not self.user(fields.get('token')):
+            return
+        state = self.server.state
+        topic = '/'.join(
+            t for t in (fields.get('primary_topic'), fields.get('secondary_topic')) if t
+        )
+        payload = []
+        for frame_slug, frame in state.frames.items():
+            if fields.get('frame') and fields['frame'] != frame_slug:
+                continue
+            exercises = [
+                dict(slug=slug, topic=state.exercises[slug]['topic'])
+                for slug in frame['exercises']
+                if state.exercises[slug]['topic'].startswith(topic)
+            ]
+            payload.append(dict(name=frame['name'], slug=frame_slug, exercises=exercises))
+        self.send_json(True, payload)
+
+    def pull(self, slug: str) -> None:
+        fields = self.form()
+        if not self.user(fields.get('token')):
+            return
+        state = self.server.state
+        slugs = state.frames[slug]['exercises'] if slug in state.frames else [slug]
+        files = {
+            f'{state.users[user_token]["username"]}/{exercise}/{path}': data
+            for (user_token, exercise), submission in state.submissions.items()
+            if exercise in slugs
+            for path, data in submission.items()
+        }
+        if not files:
+            self.send_json(False, f'There are no assignments for "{slug}"')
+            return
+        self.send_bytes(make_zip(files))
+
+    def info(self, slug: str) -> None:
+        if (exercise := self.server.state.exercises.get(slug)) is None:
+            self.send_json(False, f'Exercise "{slug}" does not exist')
+            return
+        self.send_json(True, dict(slug=slug, version=exercise['version']))
+
+    def docs(self, slug: str) -> None:
+        if not self.user(self.form().get('token')):
+            return
+        if slug not in self.server.state.exercises:
+            self.send_json(False, f'Exercise "{slug}" does not exist')
+            return
+        self.send_bytes(self.server.state.docs_bundle(slug))
+
+    def bulk_info(self) -> None:
+        slugs = self.form().get('slugs', [])
+        slugs = [slugs] if isinstance(slugs, str) else slugs
+        exercises = self.server.state.exercises
+        self.send_json(
+            True,
+            {slug: dict(version=exercises[slug]['version']) for slug in slugs if slug in exercises},
+        )
+
+
+class DevServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0,
+        bandwidth: int = 0,
+        failure_rate: float = 0,
+        seed: int | None = None,
+        chunk_size: int = 16 * 1024,
+        verbose: bool = False,
+    ):
+        """latency: seconds added to every request.
+        bandwidth: bytes per second for request and response bodies (0 is unlimited).
+        failure_rate: probability of answering with "503 Service Unavailable".
+        seed: seed for failure injection (deterministic runs)."""
+        super().__init__((host, port), DevServerHandler)
+        self.state = DevServerState()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        self.requests_count = 0
+        # Endpoints (handler names) answering "404 Not Found", as if the server lacked them
+        self.disabled_endpoints: set[str] = set()
+        # Handler names of the requests served (in order)
+        self.handled: list[str] = []
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients giving up (timeouts, hedged requests) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def settings_urls(base_url: str) -> dict[str, str]:
+    """Endpoint settings (PYPAS_*_URLPATH) pointing to another base url."""
+    return {
+        name: urljoin(base_url, urlparse(value).path)
+        for name, value in vars(settings).items()
+        if name.startswith('PYPAS_') and name.endswith('_URLPATH')
+    }
+
+
+try:
+    import pytest
+except ImportError:  # pragma: no cover
+    pass
+else:
+
+    @pytest.fixture
+    def pypas_server(monkeypatch, tmp_path):
+        """Running local server, with pypas settings pointing to it. Cache dir, main config
+        and in-process caches are isolated too, so that tests do not depend on each other."""
+        from . import config
+        from .exercise import Exercise
+
+        monkeypatch.setattr(settings, 'PYPAS_CACHE_DIR', tmp_path / 'cache')
+        monkeypatch.setattr(settings, 'MAIN_CONFIG_FILE', tmp_path / '.pypas.toml')
+        monkeypatch.setattr(Exercise, '_versions', {})
+        monkeypatch.setattr(Exercise, '_instances', {})
+        monkeypatch.setattr(config, '_toml_cache', {})
+        server = DevServer(seed=0)
+        server.start()
+        monkeypatch.setattr(settings, 'PYPAS_BASE_URL', server.base_url)
+        for name, url in settings_urls(server.base_url).items():
+            monkeypatch.setattr(settings, name, url)
+        yield server
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in pypas server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to each request')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Bytes per second (0: unlimited)')
+    parser.add_argument('--failure-rate', type=float, default=0, help='Probability of 503 errors')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for failure injection')
+    args = parser.parse_args()
+    server = DevServer(
+        args.host,
+        args.port,
+        args.latency,
+        args.bandwidth,
+        args.failure_rate,
+        args.seed,
+        verbose=True,
+    )
+    print(f'pypas dev server at {server.base_url} (token: {DEFAULT_TOKEN})')
+    print(f'Use it with: PYPAS_BASE_URL={server.base_url} pypas ...')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,50 @@
 from __future__ import annotations
 
+import contextlib
 import filecmp
+import hashlib
+import json
 import os
+import shlex
 import shutil
-import subprocess
+import sys
 import tempfile
+import threading
+import time
 import zipfile
+from concurrent.futures import Future
 from pathlib import Path
 from textwrap import dedent
-from typing import List
+from typing import Iterable, List
 
 import pathspec
 import pytest
-import toml
-from rich.panel import Panel
 
 from pypas import settings
 
-from . import network, sysutils
-from .console import CustomTable, console
+from . import network, provision, sysutils
+from .config import load_toml
+from .console import OutputMode, console
+from .runner import Limits, run_and_report
+from .snapshot import SnapshotStore, manifest_digest
+from .testreport import JSONReport
+from .watcher import FailedTests, Watcher, affected_tests
+
+# Zip members get a fixed timestamp (the earliest one allowed by zip format)
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+ZIP_DIGEST_PREFIX = 'pypas-digest:'
 
 
 class Exercise:
-    def __init__(self, exercise_slug: str):
+    # Latest versions of exercises (shared by all instances)
+    _versions: dict[str, str] = {}
+    _versions_lock = threading.Lock()
+    # Instances created from config files, so that decorators and commands share them
+    _instances: dict[Path, Exercise] = {}
+
+    def __init__(self, exercise_slug: str, path: Path = Path('.')):
         self.slug = exercise_slug
+        self.path = path
         self._latest_version = None
 
     @property
@@ -37,14 +58,100 @@ class Exercise:
     @property
     def config(self) -> dict:
         if not getattr(self, '_cfg', None) or not self._cfg:  # type: ignore
-            self._cfg = Exercise.load_config()
+            self._cfg = Exercise.load_config(self.path / settings.EXERCISE_CONFIG_FILE)
         return self._cfg
 
     @property
     def files(self):
-        for item in Path('.').glob('**/*'):
+        """Files of the exercise (relative to its path)."""
+        for item in self.path.glob('**/*'):
             if item.is_file():
-                yield item
+                yield item.relative_to(self.path)
+
+    @property
+    def state_dir(self) -> Path:
+        return self.path / settings.EXERCISE_STATE_DIR
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.state_dir / settings.UPLOAD_MANIFEST_FILE
+
+    @property
+    def venv_dir(self) -> Path:
+        return self.state_dir / 'venv'
+
+    @property
+    def has_venv(self) -> bool:
+        return bool(self.config.get('test_dependencies')) and self.venv_dir.exists()
+
+    def provision(self) -> bool:
+        """Install test dependencies (declared at exercise config) into the exercise venv."""
+        if not (dependencies := self.config.get('test_dependencies', [])):
+            return True
+        env = provision.Environment(dependencies)
+        if env.is_provisioned(self.venv_dir, env.key):
+            return True
+        with console.status(f'[dim]Provisioning test dependencies: {", ".join(dependencies)}'):
+            provisioned = env.install(self.venv_dir)
+        if provisioned:
+            console.check('Test dependencies are ready')
+        else:
+            console.fail('Test dependencies could not be installed')
+            if settings.PROVISION_OFFLINE:
+                console.info(
+                    f'[italic]Missing wheels at [note]{env.wheelhouse}[/note] (offline mode)'
+                )
+        return provisioned
+
+    @property
+    def snapshots(self) -> SnapshotStore:
+        return SnapshotStore(self.state_dir, self.path)
+
+    def take_snapshot(self, label: str = '', protected: Iterable[str] = ()) -> dict[str, str]:
+        """Snapshot of exercise files. Returns their {path: sha256}."""
+        return self.snapshots.take(self.zippable_files(), label, protected)
+
+    def restore(self, snapshot_ref: str) -> bool:
+        if (snapshot := self.snapshots.find(snapshot_ref)) is None:
+            console.error(f'Snapshot "{snapshot_ref}" not found (or ambiguous)')
+            return False
+        # Current state is also saved, so that restoring can be undone (target snapshot must
+        # survive the pruning of old snapshots)
+        self.take_snapshot('restore', protected=[snapshot['id']])
+        try:
+            restored, removed = self.snapshots.restore(snapshot, self.zippable_files())
+        except (OSError, ValueError) as err:
+            console.error(f'Snapshot could not be restored: {err}')
+            return False
+        for path in restored:
+            console.info(f'[highlight][R][/highlight] {path}')
+        for path in removed:
+            console.info(f'[highlight][D][/highlight] {path}')
+        console.success(f'Restored snapshot [note]{snapshot["id"]}[/note]', emphasis=True)
+        return True
+
+    def show_snapshots(self) -> None:
+        if not (snapshots := self.snapshots.list()):
+            console.warning('There are no snapshots of this exercise yet')
+            return
+        table = console.table('Snapshot', 'Label', 'Created', 'Files')
+        for snapshot in reversed(snapshots):
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['created']))
+            table.add_row(snapshot['id'], snapshot['label'], created, str(len(snapshot['files'])))
+        console.print(table)
+
+    def zippable_files(self, verbose: bool = False):
+        exclude_patterns = pathspec.PathSpec.from_lines(
+            'gitwildmatch', self.config.get('exclude_from_zip', [])
+        )
+        for file in self.files:
+            if file.name == self.zipname or file.parts[0] == settings.EXERCISE_STATE_DIR:
+                continue
+            if exclude_patterns.match_file(str(file)):
+                if verbose:
+                    console.warning(f'Ignoring {file}')
+                continue
+            yield file
 
     def folder_exists(self) -> bool:
         return self.folder.exists()
@@ -52,41 +159,196 @@ class Exercise:
     def download(self, token: str):
         url = settings.PYPAS_GET_EXERCISE_URLPATH.format(exercise_slug=self.slug)
         console.debug(f'Getting exercise from: [italic]{url}')
-        if monad := network.download(url, dict(token=token), self.zipname, save_temp=True):
+        fields = dict(token=token, docs='0') if settings.LAZY_DOCS else dict(token=token)
+        if monad := network.download(url, fields, self.zipname, save_temp=True):
             self.downloaded_zip = monad.payload
             return self.downloaded_zip
         else:
             console.error(monad.payload)
             return None
 
-    def zip(self, to_tmp_dir: bool = False, verbose: bool = False) -> Path:
+    def zip(
+        self,
+        to_tmp_dir: bool = False,
+        verbose: bool = False,
+        files: list[Path] | None = None,
+        size_limit: int | None = None,
+        compression: int = zipfile.ZIP_STORED,
+    ) -> Path | None:
+        """Compress exercise contents. If size_limit is given, compression is aborted (and None
+        is returned) as soon as the zipfile is known to exceed it."""
         console.info('Compressing exercise contents', cr=verbose)
-        exclude_patterns = pathspec.PathSpec.from_lines(
-            'gitwildmatch', self.config.get('exclude_from_zip', [])
+        # Members are sorted (and normalized) so that same contents give same bytes
+        files = sorted(self.zippable_files(verbose) if files is None else files)
+        sizes = {file: (self.path / file).stat().st_size for file in files}
+        # Stored (uncompressed) archives can't be smaller than their contents
+        exceeded = (
+            size_limit is not None
+            and compression == zipfile.ZIP_STORED
+            and sum(sizes.values()) > size_limit
         )
-        zip_path = tempfile.mkstemp(suffix='.zip')[1] if to_tmp_dir else self.zipname
+        zip_path = tempfile.mkstemp(suffix='.zip')[1] if to_tmp_dir else self.path / self.zipname
         zip_file = Path(zip_path)
-        with zipfile.ZipFile(zip_file, 'w') as archive:
-            for file in self.files:
-                if file.name == self.zipname:
-                    continue
-                if exclude_patterns.match_file(str(file)):
-                    if verbose:
-                        console.warning(f'Ignoring {file}')
-                    continue
+        compressed_size = 0
+        digests = {}
+        with zipfile.ZipFile(zip_file, 'w', compression) as archive:
+            for file in files:
+                if exceeded:
+                    break
                 if verbose:
                     console.debug(file)
-                archive.write(file)
+                digests[file.as_posix()] = self.write_zip_member(archive, file, compression)
+                compressed_size += archive.infolist()[-1].compress_size
+                exceeded = size_limit is not None and compressed_size > size_limit
+            archive.comment = f'{ZIP_DIGEST_PREFIX}{manifest_digest(digests)}'.encode()
+        if exceeded:
+            zip_file.unlink(missing_ok=True)
+            console.fail()
+            self.show_size_offenders(sizes, size_limit)  # type: ignore
+            return None
         if not verbose:
             console.check()
         return zip_file
 
+    def write_zip_member(
+        self, archive: zipfile.ZipFile, file: Path, compression: int, chunk_size: int = 1024 * 1024
+    ) -> str:
+        """Write file with fixed timestamp and normalized permissions. Returns its sha256.
+        File is streamed in chunks (hashed while being written), so it is never fully loaded."""
+        stat = (self.path / file).stat()
+        info = zipfile.ZipInfo(file.as_posix(), date_time=ZIP_TIMESTAMP)
+        info.create_system = 3  # unix attributes (on any platform)
+        info.external_attr = (0o100755 if stat.st_mode & 0o111 else 0o100644) << 16
+        info.compress_type = compression
+        # Same attribute that writestr() sets (it is only public since Python 3.13)
+        info._compresslevel = settings.ZIP_COMPRESSION_LEVEL  # type: ignore
+        # Expected size (so that zip64 extensions are used when needed)
+        info.file_size = stat.st_size
+        digest = hashlib.sha256()
+        with open(self.path / file, 'rb') as src, archive.open(info, 'w') as dest:
+            while chunk := src.read(chunk_size):
+                digest.update(chunk)
+                dest.write(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def zip_digest(zip_path: Path) -> str | None:
+        """Content digest of a zipfile created by pypas (stored at its comment)."""
+        try:
+            with zipfile.ZipFile(zip_path) as archive:
+                comment = archive.comment.decode()
+        except (OSError, zipfile.BadZipFile, UnicodeDecodeError):
+            return None
+        return (
+            comment.removeprefix(ZIP_DIGEST_PREFIX)
+            if comment.startswith(ZIP_DIGEST_PREFIX)
+            else None
+        )
+
+    @property
+    def submissions_cache_dir(self) -> Path:
+        return settings.PYPAS_CACHE_DIR / 'submissions' / self.slug
+
+    def cached_submission(self, digest: str) -> Path | None:
+        if not (zip_path := self.submissions_cache_dir / f'{digest}.zip').exists():
+            return None
+        zip_path.touch()  # most recently used
+        console.debug(f'Reusing compressed exercise: [italic]{zip_path}')
+        return zip_path
+
+    def cache_submission(self, zip_path: Path) -> Path:
+        """Move zipfile to local cache (keyed by content digest). Returns its new path."""
+        if (digest := self.zip_digest(zip_path)) is None:
+            return zip_path
+        self.submissions_cache_dir.mkdir(parents=True, exist_ok=True)
+        cached = shutil.move(zip_path, self.submissions_cache_dir / f'{digest}.zip')
+        zip_files = sorted(
+            self.submissions_cache_dir.glob('*.zip'), key=lambda f: f.stat().st_mtime, reverse=True
+        )
+        for old_zip in zip_files[settings.SUBMISSIONS_CACHE_SIZE :]:
+            old_zip.unlink(missing_ok=True)
+        return Path(cached)
+
+    def negotiate(
+        self, manifest: dict[str, str], previous: dict[str, str], token: str
+    ) -> tuple[bool, bool]:
+        """Ask server (before uploading anything) whether it already has this exact submission,
+        and whether it accepts a delta against the previous one. Returns (uploaded, delta)."""
+        if 'check' in (unsupported := self._unsupported_features()):
+            return False, False
+        url = settings.PYPAS_PUT_CHECK_URLPATH.format(exercise_slug=self.slug)
+        console.debug(f'Checking submission at: [italic]{url}')
+        fields = dict(token=token, digest=manifest_digest(manifest))
+        if previous and 'delta' not in unsupported:
+            fields['base'] = manifest_digest(previous)
+        if not (monad := network.post(url, fields)):
+            if network.is_missing_endpoint(monad):
+                self._save_unsupported_features('check', 'delta')
+            return False, False
+        if 'delta' not in monad.payload:
+            self._save_unsupported_features('delta')
+        delta = 'base' in fields and bool(monad.payload.get('delta'))
+        return bool(monad.payload.get('uploaded')), delta
+
+    @staticmethod
+    def _features_cache_file() -> Path:
+        return settings.PYPAS_CACHE_DIR / 'server.json'
+
+    @staticmethod
+    def _unsupported_features() -> set[str]:
+        """Features that the server (at current base url) was lately found not to support."""
+        try:
+            with open(Exercise._features_cache_file()) as f:
+                record = json.load(f).get(settings.PYPAS_BASE_URL, {})
+        except (OSError, json.JSONDecodeError, AttributeError):
+            return set()
+        if time.time() - record.get('checked_at', 0) > settings.SERVER_FEATURES_TTL:
+            return set()
+        return set(record.get('unsupported', []))
+
+    @staticmethod
+    def _save_unsupported_features(*features: str) -> None:
+        cache_file = Exercise._features_cache_file()
+        unsupported = Exercise._unsupported_features() | set(features)
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+        cache[settings.PYPAS_BASE_URL] = dict(
+            unsupported=sorted(unsupported), checked_at=time.time()
+        )
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, 'w') as f:
+                json.dump(cache, f)
+        except OSError as err:
+            console.debug(f"Server features cache couldn't be saved: {err}")
+
+    @staticmethod
+    def show_size_offenders(sizes: dict[Path, int], size_limit: int, top: int = 5) -> None:
+        """Show largest files and folders (which are candidates to be excluded from zip)."""
+        console.error(
+            f'Aborting: exercise contents are too large (limit is {sysutils.format_size(size_limit)})'
+        )
+        folder_sizes: dict[Path, int] = {}
+        for file, size in sizes.items():
+            for folder in file.parents[:-1]:
+                folder_sizes[folder] = folder_sizes.get(folder, 0) + size
+        for title, items in (('files', sizes), ('folders', folder_sizes)):
+            if largest := sorted(items.items(), key=lambda item: item[1], reverse=True)[:top]:
+                console.warning(f'Largest {title}:')
+                for path, size in largest:
+                    console.info(f'  · {path} [dim]({sysutils.format_size(size)})')
+        console.warning(
+            f'Add unneeded files to [note]exclude_from_zip[/note] at {settings.EXERCISE_CONFIG_FILE}'
+        )
+
     def unzip(self, to_tmp_dir: bool = False) -> Path:
         tmp_dir = tempfile.mkdtemp()
         target_dir = Path(tmp_dir) if to_tmp_dir else self.folder
         console.info('Inflating exercise bundle', cr=False)
-        with zipfile.ZipFile(self.downloaded_zip) as zip_ref:
-            zip_ref.extractall(target_dir)
+        sysutils.unzip(self.downloaded_zip, target_dir)
         console.check()
         try:
             self.downloaded_zip.unlink(missing_ok=True)
@@ -95,17 +357,45 @@ class Exercise:
             console.debug(f"Temporary file couldn't been removed: '{self.downloaded_zip}'")
         return target_dir
 
-    def open_docs(self):
-        os.system(f'{sysutils.get_open_cmd()} docs/README.pdf')
+    @property
+    def docs_cache_dir(self) -> Path:
+        return settings.PYPAS_CACHE_DIR / 'docs' / self.slug / self.version
+
+    def find_docs(self) -> Path | None:
+        for folder in (self.path, self.docs_cache_dir):
+            if (docs_file := folder / settings.EXERCISE_DOCS_FILE).exists():
+                return docs_file
+        return None
+
+    def fetch_docs(self, token: str) -> Path | None:
+        url = settings.PYPAS_EXERCISE_DOCS_URLPATH.format(exercise_slug=self.slug)
+        console.debug(f'Getting documentation from: [italic]{url}')
+        if monad := network.download(
+            url, dict(token=token), f'{self.slug}-docs.zip', save_temp=True
+        ):
+            sysutils.unzip(monad.payload, self.docs_cache_dir)
+            monad.payload.unlink(missing_ok=True)
+            return self.find_docs()
+        console.error(monad.payload)
+        return None
+
+    def open_docs(self, token: str):
+        if not (docs_file := self.find_docs() or self.fetch_docs(token)):
+            console.error('Documentation is not available for this exercise')
+            return
+        if not sysutils.open_file(docs_file):
+            console.warning(f"Documentation couldn't be opened. Check it at: [note]{docs_file}")
 
     def update(self, src_dir: Path, backup: bool = True):
         backup_files = pathspec.PathSpec.from_lines(
             'gitwildmatch', self.config.get('backup_on_update', [])
         )
+        if backup:
+            self.take_snapshot('update')
         for dirpath, dirs, files in os.walk(src_dir):
             for filename in files:
                 incoming_file = Path(dirpath) / filename
-                current_file = incoming_file.relative_to(src_dir)
+                current_file = self.path / incoming_file.relative_to(src_dir)
                 if current_file.exists():
                     if filecmp.cmp(current_file, incoming_file, shallow=False):
                         continue
@@ -126,8 +416,54 @@ class Exercise:
             emphasis=True,
         )
 
-    def upload(self, zipfile: Path, token: str):
-        if self.check_zipfile_size(zipfile):
+    def upload(self, token: str, validation: Future | None = None) -> bool:
+        """Upload exercise (only changes since last upload when possible). If a token validation
+        is given, it runs while zipping and no bytes are sent unless it passes."""
+        files = list(self.zippable_files())
+        sizes = {file: (self.path / file).stat().st_size for file in files}
+        # Files which could never be uploaded are not even read (to snapshot them)
+        if any(size > settings.LARGE_FILE_SIZE for size in sizes.values()):
+            self.show_size_offenders(sizes, settings.LARGE_FILE_SIZE)
+            return False
+        manifest = self.snapshots.take(files, 'put')
+        previous = self.load_manifest()
+        uploaded, delta_accepted = self.negotiate(manifest, previous, token)
+        if uploaded:
+            console.success('Exercise was already uploaded (no changes since then)')
+            self.save_manifest(manifest)
+            return True
+        # Delta is only built (and sent) when the server has agreed to take it
+        if delta_accepted:
+            # Changes alone exceeding the limit means that all files would exceed it too
+            if (delta := self.zip_delta(manifest, previous)) is None:
+                return False
+            zipfile, fields = delta
+            try:
+                if not self.token_is_valid(validation):
+                    return False
+                url = settings.PYPAS_PUT_DELTA_URLPATH.format(exercise_slug=self.slug)
+                console.debug(f'Uploading changes to: [italic]{url}')
+                fields['token'] = token
+                if monad := network.upload(
+                    url, fields=fields, filepath=zipfile, filename=self.zipname
+                ):
+                    console.success('Exercise was sucessfully uploaded')
+                    console.debug(monad.payload)
+                    self.save_manifest(manifest)
+                    return True
+                console.debug(
+                    f'Delta upload was not accepted ({monad.payload}). Uploading all files'
+                )
+            finally:
+                zipfile.unlink(missing_ok=True)
+        if (zipfile := self.cached_submission(manifest_digest(manifest))) is None:
+            files = [Path(f) for f in manifest]
+            zipfile = self.zip(to_tmp_dir=True, files=files, size_limit=settings.LARGE_FILE_SIZE)
+            if zipfile is None:
+                return False
+            zipfile = self.cache_submission(zipfile)
+        uploaded = False
+        if self.check_zipfile_size(zipfile) and self.token_is_valid(validation):
             url = settings.PYPAS_PUT_ASSIGNMENT_URLPATH.format(exercise_slug=self.slug)
             console.debug(f'Uploading exercise to: [italic]{url}')
             if monad := network.upload(
@@ -135,26 +471,134 @@ class Exercise:
             ):
                 console.success('Exercise was sucessfully uploaded')
                 console.debug(monad.payload)
+                self.save_manifest(manifest)
+                uploaded = True
             else:
                 console.error(monad.payload)
-            zipfile.unlink(missing_ok=True)
+        return uploaded
 
-    def test(self, args: List[str]):
-        if test_cmd := self.config.get('test_cmd'):
-            test_cmd = f'{test_cmd} {" ".join(args)}' if args else test_cmd
-            console.info(f'Running tests with: [note]{test_cmd}[/note]')
-            subprocess.run(test_cmd, shell=True)
-        else:
-            pytest.main(args=args)
+    def zip_delta(
+        self, manifest: dict[str, str], previous: dict[str, str]
+    ) -> tuple[Path, dict] | None:
+        """Zip only the files changed since the previous (accepted) upload, along with the
+        fields describing the delta. Returns None if changes exceed the upload size limit."""
+        changed = [Path(f) for f, digest in manifest.items() if previous.get(f) != digest]
+        deleted = sorted(set(previous) - set(manifest))
+        console.debug(
+            f'Changes since last upload: {len(changed)} modified · {len(deleted)} deleted'
+        )
+        zipfile = self.zip(to_tmp_dir=True, files=changed, size_limit=settings.LARGE_FILE_SIZE)
+        if zipfile is None:
+            return None
+        return zipfile, dict(base=manifest_digest(previous), deleted=json.dumps(deleted))
+
+    @staticmethod
+    def token_is_valid(validation: Future | None) -> bool:
+        # Unknown validity (i.e. server could not be reached) does not stop the upload
+        if validation is None or validation.result() is not False:
+            return True
+        console.error('Your access token is not valid (expired or revoked)', emphasis=True)
+        console.info('Run [note]pypas auth --help[/note] for more information.')
+        return False
+
+    def load_manifest(self) -> dict[str, str]:
+        try:
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_manifest(self, manifest: dict[str, str]) -> None:
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    def test(self, args: List[str], bench: bool = False, watch: bool = False):
+        if bench and self.config.get('test_cmd'):
+            console.warning('Benchmarks require pytest: test_cmd will be ignored')
+        if not self.provision():
+            return
+        failed = self.run_tests(args, bench)
+        if watch:
+            self.watch_tests(args, bench, failed)
+
+    def run_tests(
+        self, args: List[str], bench: bool = False, paths: List[Path] | None = None
+    ) -> set[Path]:
+        """Run tests (only those at given paths if any). Returns test files with failures."""
+        # With JSON output, stdout is only for events: reports of test tools go to stderr
+        json_output = console.mode == OutputMode.JSON
+        if not bench and (test_cmd := self.config.get('test_cmd')):
+            # External runners can not be narrowed down to some paths
+            cmd = shlex.split(test_cmd) + args
+            console.info(f'Running tests with: [note]{shlex.join(cmd)}[/note]')
+            env = provision.venv_environ(self.venv_dir) if self.has_venv else None
+            stdout = sys.stderr if json_output else None
+            result = run_and_report(cmd, Limits.from_config(self.config), env, stdout)
+            if json_output:
+                console.emit('test_summary', exit_status=result.returncode)
+            return set()
+        failures = FailedTests()
+        plugins: list = [failures]
+        if bench:
+            # Imported only when needed: benchmarks rely on pytest internals
+            from .bench import BenchPlugin
+
+            plugins.append(BenchPlugin(self.config.get('bench', {})))
+        if json_output:
+            plugins.append(JSONReport())
+        with contextlib.ExitStack() as stack:
+            if self.has_venv:
+                stack.enter_context(provision.activated(self.venv_dir))
+            if json_output:
+                stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+            pytest.main(args=args + [str(self.path / p) for p in paths or []], plugins=plugins)
+        return failures.files
+
+    def watch_tests(self, args: List[str], bench: bool = False, failed: set[Path] | None = None):
+        """Rerun tests (in this same process) whenever exercise files change. Only tests
+        affected by the changes (and the ones failing) are run again."""
+        watcher = Watcher(self.path, [self.zipname, *self.config.get('exclude_from_zip', [])])
+        console.info('[dim]Watching for changes... (Ctrl+C to stop)')
+        try:
+            for changes in watcher.changes():
+                console.info(f'[dim]Changed: {", ".join(sorted(map(str, changes)))}')
+                if settings.EXERCISE_CONFIG_FILE in {str(f) for f in changes}:
+                    self._cfg = {}
+                self.purge_modules()
+                paths = affected_tests(self.path, changes, self.zippable_files())
+                if paths is not None:
+                    paths = sorted(set(paths) | (failed or set()))
+                failed = self.run_tests(args, bench, paths)
+                console.info('[dim]Watching for changes... (Ctrl+C to stop)')
+        except KeyboardInterrupt:
+            console.info('Stopped watching')
+
+    def purge_modules(self) -> None:
+        """Forget modules imported from exercise sources, so that they are loaded again.
+        Installed packages (i.e. of a venv inside the exercise) are kept: modules like C
+        extensions can not be loaded twice."""
+        sources = {
+            (self.path / file).resolve()
+            for file in self.zippable_files()
+            if file.suffix == '.py' and 'site-packages' not in file.parts
+        }
+        for name, module in list(sys.modules.items()):
+            file = getattr(module, '__file__', None)
+            if file and Path(file).resolve() in sources:
+                del sys.modules[name]
 
     @classmethod
-    def from_config(cls) -> Exercise:
-        return cls(Exercise.load_config()['slug'])
+    def from_config(cls, path: Path = Path('.')) -> Exercise:
+        slug = Exercise.load_config(path / settings.EXERCISE_CONFIG_FILE)['slug']
+        key = path.resolve()
+        if (exercise := cls._instances.get(key)) is None or exercise.slug != slug:
+            exercise = cls._instances[key] = cls(slug, path)
+        return exercise
 
     @staticmethod
-    def load_config(filename: str = settings.EXERCISE_CONFIG_FILE):
-        with open(filename) as f:
-            return toml.load(f)
+    def load_config(filename: str | Path = settings.EXERCISE_CONFIG_FILE):
+        return load_toml(filename)
 
     @staticmethod
     def check_zipfile_size(zipfile: Path, limit=settings.LARGE_FILE_SIZE) -> bool:
@@ -174,13 +618,15 @@ class Exercise:
         url = settings.PYPAS_LOG_URLPATH
         with console.status(f'[dim]Getting log from: [italic]{url}'):
             payload = dict(token=token, frame=frame_ref, verbose=verbose)
-            if monad := network.post(url, payload):
+            if monad := network.post(url, payload, stream=True):
                 console.warning('[dim i]Listing assignments only from [b]active[/b] frames...')
-                if monad.payload:
+                # Frames are shown as soon as they arrive
+                frame = None
+                try:
                     for frame in monad.payload:
-                        console.print(Panel(frame['name'], expand=False, style='bold bright_green'))
+                        console.panel(frame['name'], style='bold bright_green')
                         console.debug(f' └ Frame slug: [bright_green]{frame["slug"]}')
-                        table = CustomTable(
+                        table = console.table(
                             'Uploaded',
                             ('Passed', 'success'),
                             ('Failed', 'error'),
@@ -209,8 +655,11 @@ class Exercise:
                                         console.fail(msg)
                                     case _:
                                         console.debug(msg)
+                except network.StreamError as err:
+                    console.error(err)
                 else:
-                    console.warning("There's no assignments with the given criteria")
+                    if frame is None:
+                        console.warning("There's no assignments with the given criteria")
             else:
                 console.error(monad.payload)
 
@@ -224,14 +673,15 @@ class Exercise:
                 primary_topic=primary_topic,
                 secondary_topic=secondary_topic,
             )
-            if monad := network.post(url, payload):
+            if monad := network.post(url, payload, stream=True):
                 console.warning('[dim i]Listing exercises only from [b]active[/b] frames...')
-                if monad.payload:
+                # Frames are shown as soon as they arrive
+                try:
                     for frame in monad.payload:
-                        console.print(Panel(frame['name'], expand=False, style='bold bright_green'))
+                        console.panel(frame['name'], style='bold bright_green')
                         console.debug(f' └ Frame slug: [bright_green]{frame["slug"]}')
                         if frame['exercises']:
-                            table = CustomTable('Exercise', ('Topic', 'magenta'))
+                            table = console.table('Exercise', ('Topic', 'magenta'))
                             for exercise in frame['exercises']:
                                 table.add_row(exercise['slug'], exercise['topic'])
                             console.print(table)
@@ -239,11 +689,20 @@ class Exercise:
                             console.warning(
                                 "There's no exercises in this frame with the given criteria"
                             )
+                except network.StreamError as err:
+                    console.error(err)
             else:
                 console.error(monad.payload)
 
     def run(self):
-        sysutils.run_python_file()
+        if self.has_venv:
+            sysutils.run_python_file(
+                limits=Limits.from_config(self.config),
+                python=str(provision.venv_python(self.venv_dir)),
+                env=provision.venv_environ(self.venv_dir),
+            )
+        else:
+            sysutils.run_python_file(limits=Limits.from_config(self.config))
 
     def __str__(self):
         return self.slug
@@ -260,21 +719,96 @@ class Exercise:
 
     @property
     def latest_version(self) -> str | None:
-        if self._latest_version:
-            return self._latest_version
-        url = settings.PYPAS_EXERCISE_INFO_URLPATH.format(exercise_slug=self.slug)
-        if monad := network.get(url):
-            self._latest_version = monad.payload.get('version')
-            return self._latest_version
-        else:
-            console.error(monad.payload)
-            return None
+        if not self._latest_version:
+            self._latest_version = Exercise.fetch_latest_versions([self.slug]).get(self.slug)
+        return self._latest_version
+
+    @classmethod
+    def fetch_latest_versions(
+        cls, slugs: Iterable[str], refresh: bool = False
+    ) -> dict[str, str | None]:
+        """Latest versions of many exercises. Cached versions (memory & disk) are used unless
+        refresh is required. The rest are resolved with a single request to the bulk endpoint,
+        or with concurrent requests if the server does not support it."""
+        slugs = list(dict.fromkeys(slugs))
+        # Lock only guards the cache: requests of concurrent callers do not wait for each other
+        with cls._versions_lock:
+            if not cls._versions and not refresh:
+                cls._versions.update(cls._load_versions_cache())
+            versions = {} if refresh else {s: cls._versions[s] for s in slugs if s in cls._versions}
+        if pending := [s for s in slugs if s not in versions]:
+            fetched = cls._request_versions(pending)
+            versions.update(fetched)
+            if fetched := {slug: v for slug, v in fetched.items() if v}:
+                with cls._versions_lock:
+                    cls._versions.update(fetched)
+                    cls._save_versions_cache(fetched)
+        return versions
+
+    @staticmethod
+    def _request_versions(slugs: list[str]) -> dict[str, str | None]:
+        if len(slugs) > 1:
+            if monad := network.post(settings.PYPAS_EXERCISES_INFO_URLPATH, dict(slugs=slugs)):
+                return {slug: (monad.payload.get(slug) or {}).get('version') for slug in slugs}
+        urls = [settings.PYPAS_EXERCISE_INFO_URLPATH.format(exercise_slug=slug) for slug in slugs]
+        versions = {}
+        for slug, monad in zip(slugs, network.get_many(urls)):
+            if monad:
+                versions[slug] = monad.payload.get('version')
+            else:
+                console.error(monad.payload)
+                versions[slug] = None
+        return versions
+
+    @staticmethod
+    def _versions_cache_file() -> Path:
+        # Settings are read on each call (they can be changed at runtime, i.e. by tests)
+        return settings.PYPAS_CACHE_DIR / 'versions.json'
+
+    @staticmethod
+    def _load_versions_cache(
+        cache_file: Path | None = None, ttl: int | None = None
+    ) -> dict[str, str]:
+        cache_file = cache_file or Exercise._versions_cache_file()
+        ttl = settings.EXERCISE_INFO_CACHE_TTL if ttl is None else ttl
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        now = time.time()
+        return {
+            slug: entry['version']
+            for slug, entry in cache.items()
+            if now - entry.get('fetched_at', 0) < ttl and entry.get('version')
+        }
+
+    @staticmethod
+    def _save_versions_cache(versions: dict[str, str], cache_file: Path | None = None) -> None:
+        cache_file = cache_file or Exercise._versions_cache_file()
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+        now = time.time()
+        cache.update({slug: dict(version=v, fetched_at=now) for slug, v in versions.items()})
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, 'w') as f:
+                json.dump(cache, f)
+        except OSError as err:
+            console.debug(f"Exercise info cache couldn't be saved: {err}")
 
     @property
     def version(self) -> str:
         return str(self.config.get('version', settings.DEFAULT_EXERCISE_VERSION))
 
-    def is_up_to_date(self) -> bool:
+    def is_up_to_date(self, refresh: bool = False) -> bool:
+        if refresh:
+            self._latest_version = Exercise.fetch_latest_versions([self.slug], refresh=True).get(
+                self.slug
+            )
         latest_version = self.latest_version
         current_version = self.version
         return latest_version == current_version
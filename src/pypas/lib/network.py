@@ -1,55 +1,189 @@
+import codecs
+import collections
+import contextlib
+import json
+import random
+import re
 import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
-from rich.progress import (
-    Progress,
-)
 
-from .console import PROGRESS_ITEMS
+from pypas import settings
+
+from .console import console
 from .monads import Monad
 
+# Shared session: keeps connections alive across requests (also from concurrent threads)
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_maxsize=settings.WORKSPACE_WORKERS))
+session.mount('https://', HTTPAdapter(pool_maxsize=settings.WORKSPACE_WORKERS))
+
+RETRY_STATUSES = (429, 502, 503, 504)
+# Statuses where the server explicitly refused to process the request
+REFUSED_STATUSES = (429, 503)
+
+
+class Attempt:
+    def __init__(self, method: str, url: str, number: int, elapsed: float, outcome: str):
+        self.method = method
+        self.url = url
+        self.number = number
+        self.elapsed = elapsed
+        self.outcome = outcome
+
+    def __str__(self):
+        return f'{self.method} {self.url} #{self.number}: {self.outcome} ({self.elapsed:.3f}s)'
+
+
+# Timing of latest request attempts
+attempts: collections.deque[Attempt] = collections.deque(maxlen=100)
+
+
+def trace(attempt: Attempt) -> None:
+    attempts.append(attempt)
+    if settings.PYPAS_TRACE_NETWORK:
+        console.debug(f'⇄ {attempt}')
+
+
+def backoff(number: int) -> float:
+    """Delay before retrying (exponential with full jitter)."""
+    return random.uniform(
+        0, min(settings.PYPAS_BACKOFF_MAX, settings.PYPAS_BACKOFF_BASE * 2**number)
+    )
+
+
+def retry_after(response: requests.Response) -> float | None:
+    if not (value := response.headers.get('Retry-After')):
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0), settings.PYPAS_RETRY_AFTER_MAX)
+
+
+def hedged(method: str, url: str, **kwargs) -> requests.Response:
+    """Send the request again if there's no response after a delay. First response wins."""
+    pool = ThreadPoolExecutor(2)
+    try:
+        futures = {pool.submit(session.request, method, url, **kwargs)}
+        done, _ = wait(futures, timeout=settings.PYPAS_HEDGE_DELAY)
+        if not done:
+            futures.add(pool.submit(session.request, method, url, **kwargs))
+        error = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # Release connection of the losing request when it finishes
+                    for pending in futures:
+                        pending.add_done_callback(
+                            lambda f: f.exception() is None and f.result().close()
+                        )
+                    return future.result()
+                error = future.exception()
+        raise error  # type: ignore
+    finally:
+        pool.shutdown(wait=False)
+
+
+def request(
+    method: str,
+    url: str,
+    idempotent: bool = True,
+    hedge: bool = False,
+    prepare: Callable[[], dict] | None = None,
+    **kwargs,
+) -> requests.Response:
+    """Request with timeouts and retries (exponential backoff or Retry-After header).
+    Non-idempotent requests are only retried when they could not reach the server or when
+    the server refused them. prepare() gives fresh keyword arguments for every attempt
+    (i.e. a request body which can only be read once)."""
+    kwargs.setdefault('timeout', (settings.PYPAS_CONNECT_TIMEOUT, settings.PYPAS_READ_TIMEOUT))
+    hedge = hedge and idempotent and settings.PYPAS_HEDGE_DELAY > 0
+    for number in range(1, settings.PYPAS_MAX_RETRIES + 2):
+        last_attempt = number > settings.PYPAS_MAX_RETRIES
+        attempt_kwargs = {**kwargs, **(prepare() if prepare else {})}
+        start = time.perf_counter()
+        try:
+            if hedge:
+                response = hedged(method, url, **attempt_kwargs)
+            else:
+                response = session.request(method, url, **attempt_kwargs)
+        except requests.RequestException as err:
+            trace(Attempt(method, url, number, time.perf_counter() - start, type(err).__name__))
+            retryable = isinstance(err, requests.ConnectTimeout) or (
+                idempotent and isinstance(err, (requests.ConnectionError, requests.Timeout))
+            )
+            if last_attempt or not retryable:
+                raise
+            time.sleep(backoff(number))
+            continue
+        status = response.status_code
+        trace(Attempt(method, url, number, time.perf_counter() - start, str(status)))
+        if last_attempt or status not in RETRY_STATUSES:
+            return response
+        if not idempotent and status not in REFUSED_STATUSES:
+            return response
+        delay = retry_after(response)
+        response.close()
+        time.sleep(backoff(number) if delay is None else delay)
+    raise AssertionError('unreachable')
+
 
 def download(url: str, fields: dict, filename: str, save_temp=False, chunk_size=1024) -> Monad:
     # https://gist.github.com/yanqd0/c13ed29e29432e3cf3e7c38467f42f51
     target_file = tempfile.mkstemp(suffix='.zip')[1] if save_temp else filename
     try:
         data = {} if all(v is None for v in fields.values()) else fields
-        response = requests.post(url, data=data, stream=True)
+        response = request('POST', url, data=data, stream=True)
         response.raise_for_status()
     except Exception as err:
         return Monad(Monad.ERROR, err)
     if response.headers.get('content-type') == 'application/json':
         if not (data := response.json())['success']:
             return Monad(Monad.ERROR, data['payload'])
-    with open(target_file, 'wb') as file, Progress(*PROGRESS_ITEMS) as progress:
-        filesize = int(response.headers.get('content-length', 0))
-        task_id = progress.add_task('download', filename=filename, total=filesize)
+    filesize = int(response.headers.get('content-length', 0))
+    with open(target_file, 'wb') as file, console.progress(filename, filesize) as advance:
         for chunk in response.iter_content(chunk_size=chunk_size):
             size = file.write(chunk)
-            progress.update(task_id, advance=size)
+            advance(size)
     return Monad(Monad.SUCCESS, Path(target_file))
 
 
 def upload(url: str, fields: dict, filepath: Path, filename: str = '') -> Monad:
     # https://stackoverflow.com/a/67726532
     def update_progress(monitor):
-        pending = filesize - task.completed
-        delta = monitor.bytes_read - task.completed
-        progress.update(task_id, advance=min(pending, delta))
+        nonlocal completed
+        if (delta := min(monitor.bytes_read, filesize) - completed) > 0:
+            advance(delta)
+            completed += delta
 
     filename = filename or filepath.name
-    with open(filepath, 'rb') as file, Progress(*PROGRESS_ITEMS) as progress:
-        filesize = filepath.stat().st_size
-        task_id = progress.add_task('upload', filename=filename, total=filesize)
-        task = progress.tasks[0]
-        fields['file'] = (filename, file)
-        e = MultipartEncoder(fields=fields)
-        m = MultipartEncoderMonitor(e, update_progress)
-        headers = {'Content-Type': m.content_type}
+    filesize = filepath.stat().st_size
+    completed = 0
+    with open(filepath, 'rb') as file, console.progress(filename, filesize) as advance:
+
+        def prepare() -> dict:
+            # Multipart body is consumed on every attempt
+            file.seek(0)
+            fields['file'] = (filename, file)
+            e = MultipartEncoder(fields=fields)
+            m = MultipartEncoderMonitor(e, update_progress)
+            return dict(data=m, headers={'Content-Type': m.content_type})
+
         try:
-            response = requests.post(url, data=m, headers=headers, stream=True)
+            response = request('POST', url, idempotent=False, prepare=prepare, stream=True)
         except Exception as err:
             return Monad(Monad.ERROR, err)
 
@@ -62,24 +196,210 @@ def upload(url: str, fields: dict, filepath: Path, filename: str = '') -> Monad:
         return Monad(data['success'], data['payload'])
 
 
-def post(url: str, payload: dict) -> Monad:
+class StreamError(Exception):
+    """Streamed response which could not be read completely (i.e. truncated or malformed)."""
+
+
+class JSONStreamReader:
+    """Incremental reader of JSON documents coming in chunks of text.
+    Only unread data is kept in memory."""
+
+    WHITESPACE = ' \t\r\n'
+    # Characters to stop at while scanning (inside and outside strings)
+    STRING_SPECIALS = re.compile(r'["\\]')
+    STRUCTURALS = re.compile(r'[][{}"]')
+    SCALAR_END = re.compile(r'[\s,:\]}]')
+
+    def __init__(self, chunks: Iterable[str]):
+        self.chunks = iter(chunks)
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def next_chunk(self) -> str | None:
+        for chunk in self.chunks:
+            if chunk:
+                return chunk
+        return None
+
+    def fill(self) -> bool:
+        if (chunk := self.next_chunk()) is None:
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character (not consumed)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON data')
+
+    def expect(self, char: str) -> None:
+        if (found := self.peek()) != char:
+            raise ValueError(f"Expecting '{char}' in JSON data but found '{found}'")
+        self.pos += 1
+
+    def skip(self, char: str) -> bool:
+        if self.peek() == char:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self) -> Any:
+        """Next value. When it spans several chunks, its end is found first (every chunk is
+        scanned only once) and then it is decoded in a single pass, so that large values are
+        read in linear time."""
+        scalar = self.peek() not in '[{"'
+        # Fast path: value is complete at buffer (a scalar could be truncated at chunk end)
+        if not scalar:
+            with contextlib.suppress(json.JSONDecodeError):
+                value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+        parts = [self.buffer]
+        text, i = self.buffer, self.pos
+        depth, in_string, escaped = 0, False, False
+        while True:
+            if scalar:
+                if match := self.SCALAR_END.search(text, i):
+                    break
+            else:
+                i += escaped
+                escaped = False
+                while match := (self.STRING_SPECIALS if in_string else self.STRUCTURALS).search(
+                    text, i
+                ):
+                    char, i = match.group(), match.end()
+                    if char == '\\':
+                        # Escaped character could be at the next chunk
+                        escaped = i == len(text)
+                        i += 1
+                        continue
+                    if char == '"':
+                        in_string = not in_string
+                    else:
+                        depth += 1 if char in '[{' else -1
+                    if not in_string and depth <= 0:
+                        break
+                if match:
+                    break
+            if (chunk := self.next_chunk()) is None:
+                if not scalar:
+                    raise ValueError('Unexpected end of JSON data')
+                # A number could be the last thing in data
+                break
+            text, i = chunk, 0
+            parts.append(text)
+        if len(parts) > 1:
+            parts[0] = parts[0][self.pos :]
+            self.buffer, self.pos = ''.join(parts), 0
+        value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+        return value
+
+    def items(self) -> Iterator[Any]:
+        """Items of an array (which must be the next value) as soon as they are read."""
+        self.expect('[')
+        if self.skip(']'):
+            return
+        while True:
+            yield self.value()
+            if not self.skip(','):
+                self.expect(']')
+                return
+
+
+def guarded(items: Iterator[Any]) -> Iterator[Any]:
+    # Errors while reading the rest of a stream are given as StreamError
+    try:
+        yield from items
+    except (ValueError, requests.RequestException) as err:
+        raise StreamError(f'Response could not be read completely: {err}') from err
+
+
+def stream_response(chunks: Iterable[str]) -> Monad:
+    """Parse a response like {"success": ..., "payload": [...]} incrementally.
+    On success, payload is an iterator over the items of the array (raising StreamError if
+    the rest of the response can not be read)."""
+    reader = JSONStreamReader(chunks)
+    success, payload = None, None
+
+    def items() -> Iterator[Any]:
+        yield from reader.items()
+        # Rest of the response is read too, so that a truncated one is always noticed
+        while reader.skip(','):
+            reader.value()
+            reader.expect(':')
+            reader.value()
+        reader.expect('}')
+
+    reader.expect('{')
+    while not reader.skip('}'):
+        key = reader.value()
+        reader.expect(':')
+        if key == 'payload' and reader.peek() == '[' and success is not False:
+            return Monad(Monad.SUCCESS, guarded(items()))
+        value = reader.value()
+        if key == 'success':
+            success = value
+        elif key == 'payload':
+            payload = value
+        reader.skip(',')
+    return Monad(Monad.SUCCESS if success else Monad.ERROR, payload)
+
+
+def post(
+    url: str,
+    payload: dict,
+    stream: bool = False,
+    chunk_size: int = 64 * 1024,
+    idempotent: bool = True,
+) -> Monad:
+    """POST request to a pypas endpoint. With stream=True, a payload array is given as an
+    iterator of items which are parsed while the response is being received."""
     try:
         payload = {} if all(v is None for v in payload.values()) else payload
-        response = requests.post(url, payload)
+        response = request('POST', url, idempotent=idempotent, data=payload, stream=stream)
         response.raise_for_status()
     except Exception as err:
         return Monad(Monad.ERROR, err)
+    if stream:
+        try:
+            return stream_response(codecs.iterdecode(response.iter_content(chunk_size), 'utf-8'))
+        except (ValueError, requests.RequestException) as err:
+            return Monad(Monad.ERROR, err)
     if not (data := response.json())['success']:
         return Monad(Monad.ERROR, data['payload'])
     return Monad(Monad.SUCCESS, data['payload'])
 
 
+def is_missing_endpoint(monad: Monad) -> bool:
+    """Whether a failed request means that the server does not have such endpoint at all."""
+    err = monad.payload
+    return (
+        isinstance(err, requests.HTTPError)
+        and err.response is not None
+        and err.response.status_code in (404, 405, 501)
+    )
+
+
 def get(url: str) -> Monad:
     try:
-        response = requests.get(url)
+        response = request('GET', url, hedge=True)
         response.raise_for_status()
     except Exception as err:
         return Monad(Monad.ERROR, err)
     if not (data := response.json())['success']:
         return Monad(Monad.ERROR, data['payload'])
     return Monad(Monad.SUCCESS, data['payload'])
+
+
+def get_many(urls: list[str], workers: int = settings.WORKSPACE_WORKERS) -> list[Monad]:
+    """Concurrent GET requests (over the shared session). Results keep the order of urls."""
+    if len(urls) <= 1:
+        return [get(url) for url in urls]
+    with ThreadPoolExecutor(min(workers, len(urls))) as pool:
+        return list(pool.map(get, urls))
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+import site
+import subprocess
+import sys
+import sysconfig
+import venv
+from pathlib import Path
+
+from pypas import settings
+
+from .console import console
+
+# Marker (inside any provisioned venv) with the key of its dependencies
+ENV_MARKER_FILE = 'pypas-env.json'
+
+
+def venv_python(venv_dir: Path) -> Path:
+    if os.name == 'nt':
+        return venv_dir / 'Scripts' / 'python.exe'
+    return venv_dir / 'bin' / 'python'
+
+
+def venv_bin(venv_dir: Path) -> Path:
+    return venv_python(venv_dir).parent
+
+
+def site_packages(venv_dir: Path) -> list[Path]:
+    return sorted(venv_dir.glob('lib/python*/site-packages')) + sorted(
+        venv_dir.glob('Lib/site-packages')
+    )
+
+
+def venv_environ(venv_dir: Path) -> dict[str, str]:
+    """Environment variables for subprocesses running "inside" the venv."""
+    env = os.environ.copy()
+    env['VIRTUAL_ENV'] = str(venv_dir.resolve())
+    env['PATH'] = os.pathsep.join([str(venv_bin(venv_dir).resolve()), env.get('PATH', '')])
+    return env
+
+
+@contextlib.contextmanager
+def activated(venv_dir: Path):
+    """Make packages of venv importable from the current process (ahead of any others).
+    Venvs are always created with the running interpreter, so their packages are compatible."""
+    saved_path = sys.path[:]
+    for path in site_packages(venv_dir):
+        # addsitedir also processes .pth files (i.e. editable installs)
+        site.addsitedir(str(path))
+    added = [path for path in sys.path if path not in saved_path]
+    sys.path[:] = added + saved_path
+    try:
+        yield
+    finally:
+        sys.path[:] = saved_path
+
+
+class Environment:
+    """Python environment with the given dependencies. Their wheels are downloaded (or built)
+    once per machine into a shared wheelhouse at the cache dir. Exercise venvs are created in
+    place (scripts refer to their own interpreter) and installed offline from it."""
+
+    def __init__(self, dependencies: list[str]):
+        self.dependencies = sorted(set(dependencies))
+
+    @property
+    def key(self) -> str:
+        # Environments are only reusable with the same interpreter and platform
+        data = dict(
+            dependencies=self.dependencies,
+            implementation=sys.implementation.cache_tag,
+            python=sys.version,
+            platform=sysconfig.get_platform(),
+        )
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+    @property
+    def wheelhouse(self) -> Path:
+        return settings.PYPAS_CACHE_DIR / 'wheels'
+
+    @staticmethod
+    def is_provisioned(venv_dir: Path, key: str) -> bool:
+        try:
+            with open(venv_dir / ENV_MARKER_FILE) as f:
+                return json.load(f).get('key') == key
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+    @staticmethod
+    def host_pip_supported() -> bool:
+        """Whether pip of the running interpreter can install into other environments (its
+        --python option is available since pip 22.3)."""
+        try:
+            version = importlib.metadata.version('pip')
+        except importlib.metadata.PackageNotFoundError:
+            return False
+        return tuple(int(n) for n in version.split('.')[:2] if n.isdigit()) >= (22, 3)
+
+    @classmethod
+    def pip(cls, python: Path, *args: str) -> bool:
+        """Run pip for the given interpreter (with pip of the running one when possible, so that
+        venvs don't need their own copy of pip)."""
+        if cls.host_pip_supported():
+            cmd = [sys.executable, '-m', 'pip', '--python', str(python)]
+        else:
+            cmd = [str(python), '-m', 'pip']
+        cmd += ['--disable-pip-version-check', '--quiet', *args]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            console.debug(result.stderr.strip())
+        return result.returncode == 0
+
+    def build(self, venv_dir: Path) -> bool:
+        """Create venv and install dependencies from wheelhouse. Missing wheels are only
+        downloaded (or built) when the offline install fails, so a warm cache needs no network
+        at all."""
+        # Bootstrapping pip (ensurepip) is the slowest part of creating a venv
+        with_pip = not self.host_pip_supported()
+        venv.EnvBuilder(with_pip=with_pip, symlinks=os.name != 'nt').create(venv_dir)
+        python = venv_python(venv_dir)
+        install_args = ('install', '--no-index', '--find-links', str(self.wheelhouse))
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+        if self.pip(python, *install_args, *self.dependencies):
+            return True
+        if settings.PROVISION_OFFLINE:
+            return False
+        wheel_args = ('wheel', '--wheel-dir', str(self.wheelhouse))
+        return self.pip(python, *wheel_args, *self.dependencies) and self.pip(
+            python, *install_args, *self.dependencies
+        )
+
+    def install(self, venv_dir: Path) -> bool:
+        """Provision venv at given dir (nothing is done if it is already up to date)."""
+        if self.is_provisioned(venv_dir, self.key):
+            return True
+        shutil.rmtree(venv_dir, ignore_errors=True)
+        if not self.build(venv_dir):
+            shutil.rmtree(venv_dir, ignore_errors=True)
+            return False
+        # Marker is written last: an interrupted build is never taken as provisioned
+        with open(venv_dir / ENV_MARKER_FILE, 'w') as f:
+            json.dump(dict(key=self.key, dependencies=self.dependencies), f, indent=2)
+        return True
@@ -0,0 +1,111 @@
+import contextlib
+import functools
+import re
+import threading
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+from rich.prompt import Confirm
+from rich.table import Table
+from rich.theme import Theme
+
+from .console import STYLES, MutableOutput
+
+PROGRESS_ITEMS = (
+    TextColumn('[bold blue]{task.fields[filename]}'),
+    BarColumn(),
+    '[progress.percentage]{task.percentage:>3.1f}%',
+    '•',
+    DownloadColumn(),
+    '•',
+    TransferSpeedColumn(),
+    '•',
+    TimeRemainingColumn(),
+)
+
+custom_theme = Theme(STYLES)
+
+
+class CustomConsole(MutableOutput, Console):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def print(self, *objects, style=None, **kwargs) -> None:
+        if self.is_muted():
+            self._local.messages.append((style or '', ' '.join(str(o) for o in objects)))
+            return
+        super().print(*objects, style=style, **kwargs)
+
+    def check(self, msg: str = '') -> None:
+        if msg:
+            msg = f'{msg} '
+        self.print(f'{msg}[success]✔')
+
+    def fail(self, msg: str = '') -> None:
+        if msg:
+            msg = f'{msg} '
+        self.print(f'{msg}[error]✘')
+
+    def resolve(self, msg: str = '', status=None) -> None:
+        match status:
+            case True:
+                self.check(msg)
+            case False:
+                self.fail(msg)
+            case _:
+                self.print(f'{msg}[highlight]?')
+
+    def message(self, msg: str, style: str, *args, emphasis=False, cr=True, **kwargs):
+        if not isinstance(msg, str):
+            msg = str(msg)
+        if emphasis and not re.search(r'(https?://\S+)|\)$', msg):
+            msg += '!'
+        end = '\n' if cr else ' '
+        self.print(msg, *args, style=style, end=end, **kwargs)
+
+    info = functools.partialmethod(message, style='info')
+    error = functools.partialmethod(message, style='error')
+    success = functools.partialmethod(message, style='success')
+    warning = functools.partialmethod(message, style='warning')
+    debug = functools.partialmethod(message, style='dim')
+    quote = functools.partialmethod(message, style='quote')
+    note = functools.partialmethod(message, style='note')
+    highlight = functools.partialmethod(message, style='highlight')
+
+    def confirm(self, prompt_text: str, default: bool = True, **kwargs) -> bool:
+        return Confirm.ask(prompt_text, default=default, **kwargs)
+
+    def table(self, *columns) -> 'CustomTable':
+        return CustomTable(*columns)
+
+    def panel(self, text: str, style: str = '') -> None:
+        self.print(Panel(text, expand=False, style=style))
+
+    @contextlib.contextmanager
+    def progress(self, filename: str, total: int):
+        """Progress bar for a file transfer. Yields a function to advance it."""
+        with Progress(*PROGRESS_ITEMS, disable=self.is_muted()) as progress:
+            task_id = progress.add_task('transfer', filename=filename, total=total)
+            yield lambda size: progress.update(task_id, advance=size)
+
+
+class CustomTable(Table):
+    def __init__(self, *columns):
+        super().__init__()
+        for column in columns:
+            if isinstance(column, str):
+                name = column
+                style = ''
+            else:
+                # iterable is expected!
+                name, style = column
+            self.add_column(name, style=style)
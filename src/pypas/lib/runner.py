@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .console import console
+
+MB = 1024 * 1024
+
+
+class Limits:
+    """Resource limits for a subprocess. Any of them can be omitted (None).
+    CPU time is enforced by the kernel in whole seconds, so fractional values are rounded up
+    (and the rounded value is the one reported)."""
+
+    def __init__(
+        self,
+        wall_time: float | None = None,
+        cpu_time: float | None = None,
+        memory: int | None = None,
+    ):
+        self.wall_time = wall_time  # seconds
+        self.cpu_time = math.ceil(cpu_time) if cpu_time else cpu_time  # seconds
+        self.memory = memory  # MB
+
+    @classmethod
+    def from_config(cls, config: dict) -> Limits:
+        """Limits from table [limits] of exercise config."""
+        limits = config.get('limits', {})
+        return cls(limits.get('wall_time'), limits.get('cpu_time'), limits.get('memory'))
+
+    def apply(self) -> None:
+        """Set limits on the current process (to be called in the child before exec)."""
+        import resource
+
+        if self.cpu_time:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_time, self.cpu_time + 1))
+        if self.memory:
+            # RLIMIT_RSS is not enforced by Linux, so address space is capped instead
+            max_bytes = int(self.memory * MB)
+            resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+class RunResult:
+    def __init__(
+        self,
+        returncode: int,
+        wall_time: float,
+        limits: Limits,
+        timed_out: bool = False,
+        error: OSError | None = None,
+    ):
+        self.returncode = returncode
+        self.wall_time = wall_time
+        self.limits = limits
+        self.timed_out = timed_out
+        self.error = error  # command could not be started
+        self.cpu_time: float | None = None
+        self.peak_memory: int | None = None  # bytes
+
+    @property
+    def cpu_exceeded(self) -> bool:
+        # Kernel sends SIGXCPU when the soft CPU limit is reached
+        return bool(self.limits.cpu_time) and self.returncode == -getattr(signal, 'SIGXCPU', 0)
+
+    def __str__(self):
+        items = [f'wall {self.wall_time:.2f}s']
+        if self.cpu_time is not None:
+            items.append(f'cpu {self.cpu_time:.2f}s')
+        if self.peak_memory is not None:
+            items.append(f'peak {self.peak_memory / MB:.1f} MB')
+        return ' · '.join(items)
+
+
+def run(
+    cmd: list[str], limits: Limits | None = None, env: dict | None = None, stdout=None
+) -> RunResult:
+    """Run a command (without shell) under the given limits, measuring its resource usage.
+    Limits on CPU time and memory are only enforced on Linux. Output of the command goes to
+    the given stdout (any file with a descriptor), or to the one of this process."""
+    limits = limits or Limits()
+    linux = sys.platform.startswith('linux')
+    use_limits = linux and (limits.cpu_time or limits.memory)
+    start = time.perf_counter()
+    try:
+        proc = subprocess.Popen(
+            cmd, env=env, stdout=stdout, preexec_fn=limits.apply if use_limits else None
+        )
+    except OSError as err:
+        # Same exit code as shells give to commands which can not be found (or run)
+        returncode = 127 if isinstance(err, FileNotFoundError) else 126
+        return RunResult(returncode, time.perf_counter() - start, limits, error=err)
+    timer = None
+    timed_out = threading.Event()
+    if limits.wall_time:
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(limits.wall_time, kill)
+        timer.start()
+    try:
+        if hasattr(os, 'wait4'):
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            proc.wait()
+            rusage = None
+    finally:
+        if timer:
+            timer.cancel()
+    result = RunResult(proc.returncode, time.perf_counter() - start, limits, timed_out.is_set())
+    if rusage:
+        result.cpu_time = rusage.ru_utime + rusage.ru_stime
+        # ru_maxrss is given in kilobytes on Linux, but in bytes on macOS
+        result.peak_memory = rusage.ru_maxrss * (1024 if linux else 1)
+    return result
+
+
+def run_and_report(
+    cmd: list[str], limits: Limits | None = None, env: dict | None = None, stdout=None
+) -> RunResult:
+    result = run(cmd, limits, env, stdout)
+    if result.error:
+        console.error(f'Command could not be run: {cmd[0]} ({result.error.strerror})')
+        return result
+    if result.timed_out:
+        console.error(f'Aborted: wall time limit exceeded ({result.limits.wall_time}s)')
+    elif result.cpu_exceeded:
+        console.error(f'Aborted: CPU time limit exceeded ({result.limits.cpu_time}s)')
+    console.debug(f'⏱ {result}')
+    return result
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable
+
+from pypas import settings
+
+from . import sysutils
+
+
+def manifest_digest(manifest: dict[str, str]) -> str:
+    """Digest of a whole set of files given as {path: sha256}."""
+    digest = hashlib.sha256()
+    for path, file_digest in sorted(manifest.items()):
+        digest.update(f'{path}\0{file_digest}\n'.encode())
+    return digest.hexdigest()
+
+
+class SnapshotStore:
+    """Content-addressed store of exercise snapshots (kept at the exercise state dir):
+
+        objects/<aa>/<sha256[2:]>   zlib-compressed contents (deduplicated by hash)
+        snapshots/<id>.json         files of each snapshot as {path: sha256}
+        index.json                  {path: [mtime_ns, size, sha256]} of last hashed files
+
+    Only files whose mtime or size changed since the last snapshot are read again."""
+
+    def __init__(self, root: Path, base: Path):
+        self.root = root  # state dir
+        self.base = base  # exercise dir (snapshot paths are relative to it)
+        self.objects_dir = root / 'objects'
+        self.snapshots_dir = root / 'snapshots'
+        self.index_file = root / 'index.json'
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def load_index(self) -> dict[str, list]:
+        try:
+            with open(self.index_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_index(self, index: dict[str, list]) -> None:
+        self.write_json(self.index_file, index)
+
+    @staticmethod
+    def write_json(path: Path, data: dict) -> None:
+        # Atomic write, so that an interrupted snapshot never leaves a broken file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=path.parent, delete=False) as f:
+            json.dump(data, f, indent=2)
+        os.replace(f.name, path)
+
+    def digest(self, file: Path, index: dict[str, list]) -> str:
+        """Hash of file contents, reused from index while mtime and size are unchanged."""
+        stat = (self.base / file).stat()
+        key = file.as_posix()
+        if (entry := index.get(key)) and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return entry[2]
+        digest = sysutils.file_digest(self.base / file)
+        index[key] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+    def store(self, file: Path, digest: str, chunk_size: int = 1024 * 1024) -> None:
+        """Compress file as an object (streamed in chunks, so it is never fully loaded)."""
+        if (object_path := self.object_path(digest)).exists():
+            return
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        compressor = zlib.compressobj(settings.SNAPSHOT_COMPRESSION_LEVEL)
+        with (
+            open(self.base / file, 'rb') as src,
+            tempfile.NamedTemporaryFile('wb', dir=object_path.parent, delete=False) as dest,
+        ):
+            while chunk := src.read(chunk_size):
+                dest.write(compressor.compress(chunk))
+            dest.write(compressor.flush())
+        os.replace(dest.name, object_path)
+
+    def extract(self, digest: str, dest: Path, chunk_size: int = 1024 * 1024) -> None:
+        """Write contents of an object to dest (decompressed in chunks).
+        Raises ValueError if it is corrupted."""
+        decompressor = zlib.decompressobj()
+        file_digest = hashlib.sha256()
+        try:
+            with open(self.object_path(digest), 'rb') as src, open(dest, 'wb') as f:
+                while chunk := src.read(chunk_size):
+                    data = decompressor.decompress(chunk)
+                    file_digest.update(data)
+                    f.write(data)
+                data = decompressor.flush()
+                file_digest.update(data)
+                f.write(data)
+        except zlib.error:
+            raise ValueError(f'Corrupted snapshot object: {digest}') from None
+        if not decompressor.eof or file_digest.hexdigest() != digest:
+            raise ValueError(f'Corrupted snapshot object: {digest}')
+
+    def add(self, files: Iterable[Path]) -> dict[str, str]:
+        """Store (if needed) the given files. Returns their {path: sha256}."""
+        index = self.load_index()
+        manifest = {}
+        for file in sorted(files):
+            digest = self.digest(file, index)
+            self.store(file, digest)
+            manifest[file.as_posix()] = digest
+        self.save_index(index)
+        return manifest
+
+    def take(
+        self, files: Iterable[Path], label: str = '', protected: Iterable[str] = ()
+    ) -> dict[str, str]:
+        """Snapshot of the given files. Returns their {path: sha256}.
+        No snapshot is saved if nothing changed since the latest one. Snapshots given as
+        protected (by id) are not pruned to make room for the new one."""
+        manifest = self.add(files)
+        if (snapshots := self.list()) and snapshots[-1]['files'] == manifest:
+            return manifest
+        snapshot_id = '{}-{}'.format(time.strftime('%Y%m%d-%H%M%S'), manifest_digest(manifest)[:6])
+        snapshot = dict(id=snapshot_id, created=time.time(), label=label, files=manifest)
+        self.write_json(self.snapshots_dir / f'{snapshot_id}.json', snapshot)
+        self.prune(snapshots + [snapshot], protected=protected)
+        return manifest
+
+    def list(self) -> list[dict]:
+        """Saved snapshots (oldest first)."""
+        snapshots = []
+        for snapshot_file in self.snapshots_dir.glob('*.json'):
+            with open(snapshot_file) as f:
+                snapshots.append(json.load(f))
+        return sorted(snapshots, key=lambda snapshot: snapshot['created'])
+
+    def find(self, snapshot_ref: str) -> dict | None:
+        """Snapshot by id (or unique prefix of it)."""
+        matches = [s for s in self.list() if s['id'].startswith(snapshot_ref)]
+        return matches[0] if len(matches) == 1 else None
+
+    def prune(
+        self, snapshots: list[dict], keep: int | None = None, protected: Iterable[str] = ()
+    ) -> None:
+        """Remove the oldest snapshots (beyond "keep") and the objects only they used.
+        Protected snapshots (by id) are always kept."""
+        keep = settings.SNAPSHOTS_KEEP if keep is None else keep
+        if len(snapshots) <= keep:
+            return
+        protected = set(protected)
+        kept = snapshots[-keep:]
+        for snapshot in snapshots[:-keep]:
+            if snapshot['id'] in protected:
+                kept.append(snapshot)
+            else:
+                (self.snapshots_dir / f'{snapshot["id"]}.json').unlink(missing_ok=True)
+        used = {digest for snapshot in kept for digest in snapshot['files'].values()}
+        for object_path in self.objects_dir.glob('*/*'):
+            if object_path.parent.name + object_path.name not in used:
+                object_path.unlink(missing_ok=True)
+
+    def restore(self, snapshot: dict, current_files: Iterable[Path]) -> tuple[list, list]:
+        """Bring files back to the given snapshot, writing only those which differ.
+        Files not present at the snapshot are removed. Returns (restored, removed) paths."""
+        index = self.load_index()
+        current = {file.as_posix() for file in current_files}
+        pending = [
+            path
+            for path, digest in snapshot['files'].items()
+            if path not in current or self.digest(Path(path), index) != digest
+        ]
+        self.root.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.root) as tmp_dir:
+            # All objects are extracted (and verified) before writing anything
+            extracted = {}
+            for i, path in enumerate(pending):
+                extracted[path] = Path(tmp_dir) / str(i)
+                self.extract(snapshot['files'][path], extracted[path])
+            for path, tmp_file in extracted.items():
+                file = self.base / path
+                file.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(tmp_file, file)
+                stat = file.stat()
+                index[path] = [stat.st_mtime_ns, stat.st_size, snapshot['files'][path]]
+        restored = pending
+        removed = []
+        for path in sorted(current - set(snapshot['files'])):
+            (self.base / path).unlink(missing_ok=True)
+            index.pop(path, None)
+            removed.append(path)
+        self.save_index(index)
+        return restored, removed
@@ -1,9 +1,13 @@
 import fnmatch
+import hashlib
+import heapq
 import os
 import shlex
+import shutil
 import subprocess
 import sys
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from importlib.metadata import PackageNotFoundError, distribution
 from pathlib import Path
 from sys import platform
@@ -13,6 +17,8 @@ import requests
 
 from pypas import console, settings
 
+from .runner import Limits, RunResult, run_and_report
+
 
 class OS:
     LINUX = 1
@@ -43,6 +49,25 @@ def get_open_cmd() -> str:
             return ''
 
 
+def open_file(path: Path) -> bool:
+    """Open file with the default application (without spawning a shell)."""
+    if check_os() == OS.WINDOWS:
+        os.startfile(path)  # type: ignore
+        return True
+    if not (open_cmd := get_open_cmd()):
+        return False
+    try:
+        subprocess.Popen(
+            [open_cmd, str(path)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except FileNotFoundError:
+        return False
+    return True
+
+
 def upgrade_pypas() -> bool:
     UPGRADE_COMMANDS = [
         'uv tool upgrade --no-cache pypas-cli',
@@ -125,26 +150,40 @@ def handle_package_version(
     return True
 
 
-def get_file_size(path: Path) -> tuple[int, str]:
+def format_size(size: int) -> str:
     KB = 1024
     MB = 1024 * 1024
 
-    size = path.stat().st_size
     if size < KB:
         usize = size
         unit = 'B'
-    elif KB < size < MB:
+    elif size < MB:
         usize = size / KB
         unit = 'KB'
     else:
         usize = size / MB
         unit = 'MB'
-    return size, f'{usize:.1f} {unit}'
+    return f'{usize:.1f} {unit}'
 
 
-def run_python_file(file='main.py'):
-    cmd = f'{sys.executable} {file}'
-    subprocess.run(shlex.split(cmd))
+def get_file_size(path: Path) -> tuple[int, str]:
+    size = path.stat().st_size
+    return size, format_size(size)
+
+
+def file_digest(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hexdigest of the file contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_python_file(
+    file='main.py', limits: Limits | None = None, python: str = sys.executable, env=None
+) -> RunResult:
+    return run_and_report([python, file], limits, env)
 
 
 def zip(path: Path, zipname: str, ignored_patterns: list[str] = []) -> Path:
@@ -159,11 +198,50 @@ def zip(path: Path, zipname: str, ignored_patterns: list[str] = []) -> Path:
     return zip_path
 
 
-def unzip(zip_path: Path, extract_to: Path | None = None) -> Path:
-    """Unzip a file to a specified directory or the current directory."""
+def unzip(
+    zip_path: Path,
+    extract_to: Path | None = None,
+    workers: int = settings.UNZIP_WORKERS,
+    min_parallel_members: int = 32,
+) -> Path:
+    """Unzip a file to a specified directory or the current directory.
+    Members are extracted concurrently, each worker with its own handle of the zip file.
+    Members which would be extracted outside the target directory are skipped."""
     extract_to = extract_to or Path.cwd()
+    root = extract_to.resolve()
+    members = []
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
+        for info in zip_ref.infolist():
+            target = (root / info.filename).resolve()
+            if target != root and root not in target.parents:
+                console.warning(f'Skipping unsafe path from zip file: {info.filename}')
+                continue
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                members.append((info, target))
+    for folder in {target.parent for _, target in members}:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    def extract(partition: list[tuple[zipfile.ZipInfo, Path]]) -> None:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for info, target in partition:
+                with zip_ref.open(info) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    if workers <= 1 or len(members) < min_parallel_members:
+        extract(members)
+        return extract_to
+    # Balance partitions by compressed size (largest members first)
+    partitions: list[list[tuple[zipfile.ZipInfo, Path]]] = [[] for _ in range(workers)]
+    loads = [(0, i) for i in range(workers)]
+    for member in sorted(members, key=lambda m: m[0].compress_size, reverse=True):
+        load, i = heapq.heappop(loads)
+        partitions[i].append(member)
+        heapq.heappush(loads, (load + member[0].compress_size + 1, i))
+    with ThreadPoolExecutor(workers) as pool:
+        # list() propagates any exception raised by workers
+        list(pool.map(extract, partitions))
     return extract_to
 
 
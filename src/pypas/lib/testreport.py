@@ -0,0 +1,53 @@
+import time
+from collections import Counter
+
+from .console import console
+
+
+class JSONReport:
+    """Pytest plugin which gives test results as console events (for JSON output mode):
+
+    {"event": "test", "nodeid": ..., "outcome": "passed|failed|skipped|error", ...}
+    {"event": "test_summary", "passed": ..., "failed": ..., "exit_status": ..., ...}
+    """
+
+    def __init__(self):
+        # Bound now, before pytest output is redirected away from stdout
+        self.console = console.target
+        self.counts: Counter[str] = Counter()
+        self.start = time.perf_counter()
+
+    def emit_test(self, report, outcome: str) -> None:
+        self.counts[outcome] += 1
+        self.console.emit(
+            'test',
+            nodeid=report.nodeid,
+            outcome=outcome,
+            when=report.when,
+            duration=getattr(report, 'duration', 0.0),
+            message=report.longreprtext if report.failed else None,
+        )
+
+    def pytest_collectreport(self, report) -> None:
+        if report.failed:
+            self.emit_test(report, 'error')
+
+    def pytest_runtest_logreport(self, report) -> None:
+        if report.when == 'call':
+            self.emit_test(report, report.outcome)
+        elif report.failed:
+            # Failures at setup or teardown (i.e. fixtures) are errors, like pytest does
+            self.emit_test(report, 'error')
+        elif report.skipped:
+            self.emit_test(report, 'skipped')
+
+    def pytest_sessionfinish(self, session, exitstatus) -> None:
+        self.console.emit(
+            'test_summary',
+            passed=self.counts['passed'],
+            failed=self.counts['failed'],
+            skipped=self.counts['skipped'],
+            errors=self.counts['error'],
+            exit_status=int(exitstatus),
+            duration=time.perf_counter() - self.start,
+        )
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import ast
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import pathspec
+
+from pypas import settings
+
+# https://man7.org/linux/man-pages/man7/inotify.7.html
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+# Changes which can not be told apart (i.e. queue overflow): everything must be considered changed
+ANY_CHANGE = Path('.')
+
+
+class PollingBackend:
+    """Detect changes by comparing (mtime, size) of files between scans."""
+
+    def __init__(self, root: Path, ignored):
+        self.root = root
+        self.ignored = ignored
+        self.state = self.scan()
+
+    def scan(self) -> dict[Path, tuple[int, int]]:
+        state = {}
+        for dirpath, dirs, files in os.walk(self.root):
+            folder = Path(dirpath).relative_to(self.root)
+            dirs[:] = [d for d in dirs if not self.ignored(folder / d, is_dir=True)]
+            for filename in files:
+                if self.ignored(file := folder / filename):
+                    continue
+                try:
+                    stat = (self.root / file).stat()
+                except FileNotFoundError:
+                    continue
+                state[file] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            interval = settings.WATCH_POLL_INTERVAL
+            if deadline is not None:
+                interval = min(interval, max(deadline - time.monotonic(), 0))
+            time.sleep(interval)
+            previous, self.state = self.state, self.scan()
+            changes = {
+                f
+                for f in previous.keys() | self.state.keys()
+                if previous.get(f) != self.state.get(f)
+            }
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyBackend:
+    """Detect changes with Linux inotify (through libc, so no extra dependencies are needed).
+    Raises OSError if inotify is not available (or watches are exhausted)."""
+
+    def __init__(self, root: Path, ignored):
+        self.root = root
+        self.ignored = ignored
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if (fd := self.libc.inotify_init1(os.O_CLOEXEC)) < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.fd = fd
+        self.folders: dict[int, Path] = {}
+        try:
+            self.add_tree(Path('.'))
+        except OSError:
+            self.close()
+            raise
+
+    def add_tree(self, folder: Path) -> None:
+        for dirpath, dirs, _ in os.walk(self.root / folder):
+            current = Path(dirpath).relative_to(self.root)
+            dirs[:] = [d for d in dirs if not self.ignored(current / d, is_dir=True)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(self.root / current), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed on {current}')
+            self.folders[wd] = current
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changes = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changes.add(ANY_CHANGE)
+                continue
+            if mask & IN_IGNORED:
+                self.folders.pop(wd, None)
+                continue
+            if (folder := self.folders.get(wd)) is None or not name:
+                continue
+            path = folder / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not self.ignored(path, is_dir=True):
+                    try:
+                        self.add_tree(path)
+                    except OSError:
+                        changes.add(ANY_CHANGE)
+                    changes.update(
+                        p.relative_to(self.root)
+                        for p in (self.root / path).rglob('*')
+                        if p.is_file() and not self.ignored(p.relative_to(self.root))
+                    )
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changes.add(ANY_CHANGE)
+            elif not self.ignored(path):
+                changes.add(path)
+        return changes
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Watcher:
+    """Changes of files under a folder, debounced: a burst of events (i.e. an editor saving
+    several files) is given as a single set of paths (relative to the folder)."""
+
+    def __init__(self, root: Path, ignore_patterns: Iterable[str] = ()):
+        self.root = root
+        patterns = [*settings.WATCH_IGNORE, f'{settings.EXERCISE_STATE_DIR}/', *ignore_patterns]
+        self.ignore_spec = pathspec.PathSpec.from_lines('gitwildmatch', patterns)
+        self.backend = self.make_backend()
+
+    def ignored(self, path: Path, is_dir: bool = False) -> bool:
+        return self.ignore_spec.match_file(path.as_posix() + ('/' if is_dir else ''))
+
+    def make_backend(self) -> InotifyBackend | PollingBackend:
+        if sys.platform.startswith('linux') and not settings.WATCH_POLLING:
+            try:
+                return InotifyBackend(self.root, self.ignored)
+            except OSError:
+                pass
+        return PollingBackend(self.root, self.ignored)
+
+    def changes(self, debounce: float = settings.WATCH_DEBOUNCE) -> Iterator[set[Path]]:
+        try:
+            while True:
+                if not (changes := self.backend.wait()):
+                    continue
+                # Wait until there are no more events for "debounce" seconds
+                while more := self.backend.wait(debounce):
+                    changes |= more
+                yield changes
+        finally:
+            self.backend.close()
+
+
+class FailedTests:
+    """Pytest plugin which collects the test files with failures."""
+
+    def __init__(self):
+        self.files: set[Path] = set()
+
+    def pytest_runtest_logreport(self, report) -> None:
+        if report.failed:
+            self.files.add(Path(report.nodeid.split('::')[0]))
+
+
+def module_names(file: Path) -> list[str]:
+    """Names under which a module file can be imported (any package root is assumed)."""
+    parts = file.with_suffix('').parts
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return ['.'.join(parts[i:]) for i in range(len(parts))]
+
+
+def imported_names(file: Path, source: str) -> set[str]:
+    names = set()
+    package = file.parent.parts
+    for node in ast.walk(ast.parse(source, filename=str(file))):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = package[: len(package) - node.level + 1] if node.level else ()
+            module = '.'.join([*base, *(node.module or '').split('.')]).strip('.')
+            names.add(module)
+            names.update(f'{module}.{alias.name}'.strip('.') for alias in node.names)
+    # Importing "a.b.c" also imports "a.b" and "a"
+    return {'.'.join(name.split('.')[:i]) for name in names for i in range(1, name.count('.') + 2)}
+
+
+def is_test_file(file: Path) -> bool:
+    return file.suffix == '.py' and (file.name.startswith('test_') or file.stem.endswith('_test'))
+
+
+def affected_tests(root: Path, changes: set[Path], files: Iterable[Path]) -> list[Path] | None:
+    """Test files which (transitively) import any of the changed files, based on a static
+    import graph. Returns None when all tests should be run: changes not related to Python
+    modules (data, config, conftest, deleted files...) or no test could be related to them."""
+    if any(
+        f == ANY_CHANGE or f.suffix != '.py' or f.name == 'conftest.py' or not (root / f).exists()
+        for f in changes
+    ):
+        return None
+    modules: dict[str, set[Path]] = defaultdict(set)
+    py_files = [f for f in files if f.suffix == '.py']
+    for file in py_files:
+        for name in module_names(file):
+            modules[name].add(file)
+    dependents: dict[Path, set[Path]] = defaultdict(set)
+    for file in py_files:
+        try:
+            names = imported_names(file, (root / file).read_text())
+        except (SyntaxError, UnicodeDecodeError, OSError):
+            continue
+        for name in names:
+            for dependency in modules.get(name, ()):
+                dependents[dependency].add(file)
+    affected, pending = set(changes), list(changes)
+    while pending:
+        for dependent in dependents[pending.pop()] - affected:
+            affected.add(dependent)
+            pending.append(dependent)
+    return sorted(f for f in affected if is_test_file(f)) or None
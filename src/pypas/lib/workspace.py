@@ -0,0 +1,102 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from pypas import settings
+
+from . import sysutils
+from .config import Config
+from .console import console
+from .exercise import Exercise
+
+Action = Callable[[Exercise], tuple[bool, str]]
+
+
+class Workspace:
+    """Folder containing (possibly many) exercises, each one with its own config file."""
+
+    def __init__(self, root: Path = Path('.'), workers: int = settings.WORKSPACE_WORKERS):
+        self.root = root
+        self.workers = workers
+
+    @property
+    def exercises(self) -> list[Exercise]:
+        if not getattr(self, '_exercises', None):
+            folders = list(Config.find_nested_configs(self.root))
+            if Config.local_config_exists(str(self.root / settings.EXERCISE_CONFIG_FILE)):
+                folders.append(self.root.resolve())
+            base = self.root.resolve()
+            self._exercises = []
+            for folder in sorted(folders):
+                try:
+                    self._exercises.append(Exercise.from_config(folder.relative_to(base)))
+                except (KeyError, ValueError, OSError) as err:
+                    # One broken config must not stop the rest of exercises
+                    console.warning(
+                        f'Skipping ./{folder.relative_to(base)}: invalid '
+                        f'{settings.EXERCISE_CONFIG_FILE} ({type(err).__name__}: {err})'
+                    )
+        return self._exercises
+
+    def fetch_latest_versions(self, refresh: bool = False) -> None:
+        """Query exercise info once per slug (and share it among exercises with same slug)."""
+        versions = Exercise.fetch_latest_versions([e.slug for e in self.exercises], refresh)
+        for exercise in self.exercises:
+            exercise._latest_version = versions.get(exercise.slug)
+
+    def run(self, action: Action, description: str) -> bool:
+        """Run action on every exercise (concurrently) and show a table with results.
+        Returns True if action succeeded on all exercises."""
+        if not (exercises := self.exercises):
+            console.warning('No exercises were found in current folder')
+            return False
+        with console.status(f'[dim]{description} {len(exercises)} exercises...'):
+            with ThreadPoolExecutor(self.workers) as pool:
+                results = list(pool.map(lambda e: self._run_action(action, e), exercises))
+        table = console.table('Folder', ('Exercise', 'note'), 'Result')
+        for exercise, (success, detail) in zip(exercises, results):
+            status = '[success]✔[/success]' if success else '[error]✘[/error]'
+            table.add_row(f'./{exercise.path}', exercise.slug, f'{status} {detail}')
+        console.print(table)
+        return all(success for success, _ in results)
+
+    @staticmethod
+    def _run_action(action: Action, exercise: Exercise) -> tuple[bool, str]:
+        with console.muted() as messages:
+            try:
+                success, detail = action(exercise)
+            except Exception as err:
+                success, detail = False, str(err)
+        if not success and not detail:
+            errors = [text for style, text in messages if style == 'error']
+            detail = errors[-1] if errors else ''
+        return success, detail
+
+    def zip(self) -> bool:
+        def action(exercise: Exercise) -> tuple[bool, str]:
+            zipfile = exercise.zip()
+            _, str_size = sysutils.get_file_size(zipfile)
+            return True, f'{zipfile.name} [dim]({str_size})'
+
+        return self.run(action, 'Compressing')
+
+    def put(self, token: str, validation: Future | None = None) -> bool:
+        def action(exercise: Exercise) -> tuple[bool, str]:
+            return (True, 'Uploaded') if exercise.upload(token, validation) else (False, '')
+
+        return self.run(action, 'Uploading')
+
+    def update(self, token: str, backup: bool = True) -> bool:
+        def action(exercise: Exercise) -> tuple[bool, str]:
+            if exercise.is_up_to_date():
+                return True, f'Up to date [note]{exercise.version}'
+            if not exercise.download(token):
+                return False, ''
+            exercise.update(src_dir=exercise.unzip(to_tmp_dir=True), backup=backup)
+            return (
+                True,
+                f'Updated [note]{exercise.version}[/note] → [note]{exercise.latest_version}',
+            )
+
+        self.fetch_latest_versions(refresh=True)
+        return self.run(action, 'Updating')
@@ -2,9 +2,9 @@ from pathlib import Path
 from typing import List
 
 import typer
-from rich.prompt import Confirm
 
-from pypas import Config, Exercise, User, console, sysutils
+from pypas import Config, Exercise, User, Workspace, console, sysutils
+from pypas.lib.console import OutputMode
 from pypas.lib.decorators import (
     auth_required,
     check_exercise_version,
@@ -29,7 +29,15 @@ def default(
         show_default=False,
         help='Show pypas-cli installed version.',
     ),
+    json_output: bool = typer.Option(
+        False, '--json', help='Output events as JSON lines (for scripted use).'
+    ),
+    quiet: bool = typer.Option(False, '--quiet', '-q', help='Only show errors.'),
 ):
+    if json_output:
+        console.set_mode(OutputMode.JSON)
+    elif quiet:
+        console.set_mode(OutputMode.QUIET)
     if version:
         sysutils.handle_package_version()
         sysutils.show_package_info()
@@ -47,19 +55,20 @@ def get(exercise_slug: str = typer.Argument(help='Slug of exercise')):
         console.info(
             '[italic]If continue, files coming from server will [red]OVERWRITE[/red] your existing files'
         )
-        if not Confirm.ask('Continue', default=False):
+        if not console.confirm('Continue', default=False):
             return
     if Config.local_config_exists():
         console.warning('Current folder seems to be a pypas exercise.')
         console.info(
             '[italic]If continue, files coming from server will [red]MESS[/red] your existing files'
         )
-        if not Confirm.ask('Continue', default=False):
+        if not console.confirm('Continue', default=False):
             return
     config = Config()
     if exercise.download(config.get('token')):  # type: ignore
         exercise.unzip()
         console.info(f'Exercise is available at [note]./{exercise.folder}[/note] [success]✔')
+        Exercise(exercise.slug, exercise.folder).provision()
 
 
 @app.command()
@@ -68,20 +77,28 @@ def get(exercise_slug: str = typer.Argument(help='Slug of exercise')):
 def doc():
     """Open documentation for exercise."""
     exercise = Exercise.from_config()
-    exercise.open_docs()
+    config = Config()
+    exercise.open_docs(config.get('token'))  # type: ignore
 
 
 @app.command()
-@inside_exercise
+@inside_exercise(unless='all_exercises')
 @check_pypas_version
 def update(
     force: bool = typer.Option(
         False, '--force', '-f', help='Force update and omit backup of existing files'
     ),
+    all_exercises: bool = typer.Option(
+        False, '--all', '-a', help='Update all exercises found under current folder.'
+    ),
 ):
     """Update exercise."""
     # Backup patterns follow fnmatch syntax: https://docs.python.org/3/library/fnmatch.html
-    if (exercise := Exercise.from_config()).is_up_to_date():
+    if all_exercises:
+        config = Config()
+        Workspace().update(config.get('token'), backup=not force)  # type: ignore
+        return
+    if (exercise := Exercise.from_config()).is_up_to_date(refresh=True):
         console.success(
             f"You're on the latest version of [i]{exercise}[/i]: [note]{exercise.version}[/note]"
         )
@@ -92,6 +109,21 @@ def update(
         exercise.update(src_dir=dir, backup=not force)
 
 
+@app.command()
+@inside_exercise
+def restore(
+    snapshot: str = typer.Argument(
+        None, help='Snapshot id (or prefix). List snapshots if omitted.'
+    ),
+):
+    """Restore exercise files from a local snapshot (taken on update & put)."""
+    exercise = Exercise.from_config()
+    if snapshot is None:
+        exercise.show_snapshots()
+    else:
+        exercise.restore(snapshot)
+
+
 @app.command()
 @check_pypas_version
 def auth(token: str = typer.Argument(help='Access token')):
@@ -108,34 +140,51 @@ def upgrade():
 
 
 @app.command()
-@inside_exercise
+@inside_exercise(unless='all_exercises')
 @check_pypas_version
-def zip(verbose: bool = typer.Option(False, '--verbose', '-v', help='Increase verbosity.')):
+def zip(
+    verbose: bool = typer.Option(False, '--verbose', '-v', help='Increase verbosity.'),
+    all_exercises: bool = typer.Option(
+        False, '--all', '-a', help='Compress all exercises found under current folder.'
+    ),
+):
     """Compress exercise contents."""
     # Excluded patterns follow fnmatch syntax: https://docs.python.org/3/library/fnmatch.html
+    if all_exercises:
+        Workspace().zip()
+        return
     exercise = Exercise.from_config()
     zipfile = exercise.zip(verbose=verbose)
     size, str_size = sysutils.get_file_size(zipfile)
     console.info(f'Compressed exercise is available at: [note]{zipfile}[/note] [dim]({str_size})')
+    console.debug(f'Content digest: {exercise.zip_digest(zipfile)}')  # type: ignore
 
 
 @app.command()
 @auth_required
-@inside_exercise
+@inside_exercise(unless='all_exercises')
 @check_pypas_version
-def put():
+def put(
+    all_exercises: bool = typer.Option(
+        False, '--all', '-a', help='Upload all exercises found under current folder.'
+    ),
+):
     """Put (upload) exercise."""
     config = Config()
+    # Token is checked while exercises are being zipped (fails before uploading anything)
+    validation = User(config['token']).validate_in_background()  # type: ignore
+    if all_exercises:
+        Workspace().put(config['token'], validation)  # type: ignore
+        return
     if nested_config_path := config.find_nested_config(relative_to_cwd=True):
         console.warning(
             f'Another exercise seems to be nested inside current folder: ./{nested_config_path}'
         )
         console.info('[italic]If continue, upload will [red]BREAK[/red] testing[/italic]')
-        if not Confirm.ask('Continue', default=False):
+        if not console.confirm('Continue', default=False):
             return
     exercise = Exercise.from_config()
-    zipfile = exercise.zip(to_tmp_dir=True)
-    exercise.upload(zipfile, config['token'])  # type: ignore
+    exercise.upload(config['token'], validation)  # type: ignore
 
 
 @app.command(context_settings={'ignore_unknown_options': True})
@@ -144,10 +193,17 @@ def put():
 @check_pypas_version(confirm=True, confirm_suffix='testing')
 def test(
     args: List[str] = typer.Argument(None, help='Arguments passed to test tool'),
+    bench: bool = typer.Option(
+        False, '--bench', '-b', help='Check performance budgets of exercise.'
+    ),
+    watch: bool = typer.Option(
+        False, '--watch', '-w', help='Rerun affected tests whenever files change.'
+    ),
 ):
     """Test exercise."""
+    # Version checks (decorators) are only done once, not on every rerun
     exercise = Exercise.from_config()
-    exercise.test(args or [])
+    exercise.test(args or [], bench=bench, watch=watch)
 
 
 @app.command()
@@ -178,7 +234,7 @@ def list(
 def unauth():
     """Unauthenticate from pypas.es (clear token)."""
     config = Config()
-    config.save(token='')
+    config.save(token='', auth={})
     console.success('You have been successfully unauthenticated')
 
 
@@ -201,7 +257,7 @@ def pull(
         console.info(
             '[italic]If continue, files coming from server will [red]OVERWRITE[/red] your existing files'
         )
-        if not Confirm.ask('Continue', default=False):
+        if not console.confirm('Continue', default=False):
             return
     config = Config()
     if file := Exercise.pull(item_slug, config.get('token')):  # type: ignore
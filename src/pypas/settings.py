@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from urllib.parse import urljoin
 
@@ -7,14 +8,67 @@ PYPAS_BASE_URL = config('PYPAS_BASE_URL', default='https://pypas.es/')
 PYPAS_AUTH_URLPATH = urljoin(PYPAS_BASE_URL, '/access/auth/')
 PYPAS_GET_EXERCISE_URLPATH = urljoin(PYPAS_BASE_URL, '/exercises/get/{exercise_slug}/')
 PYPAS_PUT_ASSIGNMENT_URLPATH = urljoin(PYPAS_BASE_URL, '/assignments/put/{exercise_slug}/')
+PYPAS_PUT_DELTA_URLPATH = urljoin(PYPAS_BASE_URL, '/assignments/put/{exercise_slug}/delta/')
+PYPAS_PUT_CHECK_URLPATH = urljoin(PYPAS_BASE_URL, '/assignments/put/{exercise_slug}/check/')
 PYPAS_LOG_URLPATH = urljoin(PYPAS_BASE_URL, '/assignments/log/')
 PYPAS_LIST_EXERCISES_URLPATH = urljoin(PYPAS_BASE_URL, '/exercises/list/')
 PYPAS_PULL_URLPATH = urljoin(PYPAS_BASE_URL, '/assignments/pull/{item_slug}/')
 PYPAS_EXERCISE_INFO_URLPATH = urljoin(PYPAS_BASE_URL, '/exercises/info/{exercise_slug}/')
+PYPAS_EXERCISES_INFO_URLPATH = urljoin(PYPAS_BASE_URL, '/exercises/info/')
+PYPAS_EXERCISE_DOCS_URLPATH = urljoin(PYPAS_BASE_URL, '/exercises/docs/{exercise_slug}/')
 
 EXERCISE_CONFIG_FILE = config('EXERCISE_CONFIG_FILE', default='.pypas.toml')
+EXERCISE_STATE_DIR = config('EXERCISE_STATE_DIR', default='.pypas')
+UPLOAD_MANIFEST_FILE = config('UPLOAD_MANIFEST_FILE', default='manifest.json')
+EXERCISE_DOCS_FILE = config('EXERCISE_DOCS_FILE', default='docs/README.pdf')
+# Get exercises without docs (which are fetched on first "pypas doc")
+LAZY_DOCS = config('LAZY_DOCS', default=True, cast=config.boolean)
 MAIN_CONFIG_FILE = config('MAIN_CONFIG_FILE', default=Path.home() / '.pypas.toml', cast=Path)
 LARGE_FILE_SIZE = config('LARGE_FILE_SIZE', default=1024 * 1024, cast=int)
+SNAPSHOTS_KEEP = config('SNAPSHOTS_KEEP', default=20, cast=int)
+SNAPSHOT_COMPRESSION_LEVEL = config('SNAPSHOT_COMPRESSION_LEVEL', default=6, cast=int)
+# Seconds to trust a token validation (recorded at main config)
+TOKEN_VALIDATION_TTL = config('TOKEN_VALIDATION_TTL', default=3600, cast=int)
+ZIP_COMPRESSION_LEVEL = config('ZIP_COMPRESSION_LEVEL', default=6, cast=int)
+# Compressed submissions kept (per exercise) at the local cache
+SUBMISSIONS_CACHE_SIZE = config('SUBMISSIONS_CACHE_SIZE', default=5, cast=int)
+# Test dependencies are only installed from the local wheelhouse (never downloaded)
+PROVISION_OFFLINE = config('PROVISION_OFFLINE', default=False, cast=config.boolean)
+WORKSPACE_WORKERS = config('WORKSPACE_WORKERS', default=4, cast=int)
+UNZIP_WORKERS = config('UNZIP_WORKERS', default=min(8, os.cpu_count() or 1), cast=int)
+
+# Network resilience (timeouts & backoff in seconds)
+PYPAS_CONNECT_TIMEOUT = config('PYPAS_CONNECT_TIMEOUT', default=5, cast=float)
+PYPAS_READ_TIMEOUT = config('PYPAS_READ_TIMEOUT', default=60, cast=float)
+PYPAS_MAX_RETRIES = config('PYPAS_MAX_RETRIES', default=3, cast=int)
+PYPAS_BACKOFF_BASE = config('PYPAS_BACKOFF_BASE', default=0.5, cast=float)
+PYPAS_BACKOFF_MAX = config('PYPAS_BACKOFF_MAX', default=10, cast=float)
+PYPAS_RETRY_AFTER_MAX = config('PYPAS_RETRY_AFTER_MAX', default=60, cast=float)
+# Send a second (hedged) GET request if the first one takes longer than this (0 disables it)
+PYPAS_HEDGE_DELAY = config('PYPAS_HEDGE_DELAY', default=0, cast=float)
+PYPAS_TRACE_NETWORK = config('PYPAS_TRACE_NETWORK', default=False, cast=config.boolean)
+
+PYPAS_CACHE_DIR = config('PYPAS_CACHE_DIR', default=Path.home() / '.cache' / 'pypas', cast=Path)
+# Seconds to trust cached exercise info (latest versions)
+EXERCISE_INFO_CACHE_TTL = config('EXERCISE_INFO_CACHE_TTL', default=300, cast=int)
+# Seconds to remember that the server does not support some feature (i.e. delta uploads)
+SERVER_FEATURES_TTL = config('SERVER_FEATURES_TTL', default=24 * 3600, cast=int)
+
+# Watch mode ("pypas test --watch"): seconds without events before rerunning tests
+WATCH_DEBOUNCE = config('WATCH_DEBOUNCE', default=0.3, cast=float)
+WATCH_POLL_INTERVAL = config('WATCH_POLL_INTERVAL', default=0.5, cast=float)
+# Use polling even when inotify is available
+WATCH_POLLING = config('WATCH_POLLING', default=False, cast=config.boolean)
+WATCH_IGNORE = config(
+    'WATCH_IGNORE',
+    default='__pycache__/, .pytest_cache/, .git/, *.pyc, *.swp, *~, .#*',
+    cast=config.list,
+)
+
+BENCH_WARMUP_ROUNDS = config('BENCH_WARMUP_ROUNDS', default=3, cast=int)
+BENCH_ROUNDS = config('BENCH_ROUNDS', default=20, cast=int)
+# Seconds taken by the bench calibration loop on the reference machine
+BENCH_CALIBRATION_REFERENCE = config('BENCH_CALIBRATION_REFERENCE', default=0.02, cast=float)
 
 PYPAS_SKIP_VERSION_CHECK_VAR = config(
     'PYPAS_SKIP_VERSION_CHECK_VAR', default='PYPAS_SKIP_VERSION_CHECK'
@@ -0,0 +1,25 @@
+import io
+
+import pytest
+
+from pypas.lib.console import QuietConsole
+
+
+class Terminal(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_quiet_confirm_asks_on_terminal(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', Terminal('maybe\nyes\n'))
+    assert QuietConsole().confirm('[bold]Continue', default=False)
+    assert capsys.readouterr().err == 'Continue [y/N]: ' * 2
+
+
+def test_quiet_confirm_aborts_without_terminal(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO())
+    assert QuietConsole().confirm('Continue?')
+    with pytest.raises(SystemExit) as exc_info:
+        QuietConsole().confirm('Continue', default=False)
+    assert exc_info.value.code == 1
+    assert 'aborted' in capsys.readouterr().err
@@ -0,0 +1,45 @@
+from pypas import Exercise, User, settings
+from pypas.lib import network
+from pypas.lib.config import Config
+
+pytest_plugins = ['pypas.lib.devserver']
+
+
+def test_settings_are_isolated(pypas_server, tmp_path):
+    assert settings.PYPAS_BASE_URL == pypas_server.base_url
+    assert settings.PYPAS_CACHE_DIR == tmp_path / 'cache'
+    assert Config().path == tmp_path / '.pypas.toml'
+
+
+def test_authenticate(pypas_server):
+    # Imported here: plugin modules must be imported by pytest (for assertion rewriting)
+    from pypas.lib.devserver import DEFAULT_TOKEN
+
+    user = User(DEFAULT_TOKEN)
+    assert user.authenticate()
+    assert Config()['auth']['username'] == 'student'
+    assert user.validate()
+    # Validation is cached at (isolated) main config
+    assert pypas_server.requests_count == 1
+
+
+def test_latest_versions_are_cached(pypas_server):
+    versions = Exercise.fetch_latest_versions(['hello', 'sum'])
+    assert versions == {'hello': '0.1.0', 'sum': '0.2.0'}
+    assert (settings.PYPAS_CACHE_DIR / 'versions.json').exists()
+    assert Exercise.fetch_latest_versions(['hello']) == {'hello': '0.1.0'}
+    assert pypas_server.requests_count == 1
+
+
+def test_versions_are_not_shared_between_tests(pypas_server):
+    # Would be served from memory if the previous test leaked its versions
+    Exercise.fetch_latest_versions(['hello'])
+    assert pypas_server.requests_count == 1
+
+
+def test_failures_are_reported(pypas_server, monkeypatch):
+    monkeypatch.setattr(settings, 'PYPAS_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(settings, 'PYPAS_RETRY_AFTER_MAX', 0.01)
+    pypas_server.failure_rate = 1
+    monad = network.get(settings.PYPAS_EXERCISE_INFO_URLPATH.format(exercise_slug='hello'))
+    assert not monad
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from pypas.lib.network import StreamError, stream_response
+
+ITEMS = [
+    {'id': 1, 'name': 'hello', 'tags': ['a', 'b']},
+    'quoted \\"value\\" with [brackets] and {braces}',
+    -12.5e3,
+    [True, False, None, {}],
+    'ñandú ✔',
+    123456789,
+]
+DOCUMENT = json.dumps(dict(success=True, payload=ITEMS))
+
+
+def split(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8, 13, len(DOCUMENT)])
+def test_values_split_across_chunks(size):
+    monad = stream_response(split(DOCUMENT, size))
+    assert monad
+    assert list(monad.payload) == ITEMS
+
+
+def test_error_response():
+    monad = stream_response(split(json.dumps(dict(success=False, payload='Not found')), 3))
+    assert not monad
+    assert monad.payload == 'Not found'
+
+
+def test_truncated_response_raises_stream_error():
+    start = DOCUMENT.index('[') + 1
+    for end in range(start, len(DOCUMENT)):
+        monad = stream_response(split(DOCUMENT[:end], 4))
+        with pytest.raises(StreamError):
+            list(monad.payload)
+
+
+def test_members_after_payload_are_read():
+    document = json.dumps(dict(payload=ITEMS, success=True, count=len(ITEMS)))
+    assert list(stream_response(split(document, 7)).payload) == ITEMS
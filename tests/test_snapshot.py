@@ -0,0 +1,68 @@
+import pytest
+
+from pypas import Exercise, settings
+
+
+@pytest.fixture
+def exercise(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'SNAPSHOTS_KEEP', 3)
+    (tmp_path / settings.EXERCISE_CONFIG_FILE).write_text('slug = "hello"\n')
+    return Exercise('hello', tmp_path)
+
+
+def write_version(exercise: Exercise, version: int) -> None:
+    (exercise.path / 'main.py').write_text(f'print({version})\n')
+
+
+def test_restore(exercise):
+    write_version(exercise, 1)
+    exercise.take_snapshot('first')
+    write_version(exercise, 2)
+    (exercise.path / 'extra.py').write_text('pass\n')
+    exercise.take_snapshot('second')
+    write_version(exercise, 3)
+
+    first = exercise.snapshots.list()[0]
+    assert exercise.restore(first['id'])
+    assert (exercise.path / 'main.py').read_text() == 'print(1)\n'
+    assert not (exercise.path / 'extra.py').exists()
+    # Restoring can be undone
+    latest = exercise.snapshots.list()[-1]
+    assert latest['label'] == 'restore'
+    assert exercise.restore(latest['id'])
+    assert (exercise.path / 'main.py').read_text() == 'print(3)\n'
+
+
+def test_restore_oldest_snapshot_at_capacity(exercise):
+    for version in range(settings.SNAPSHOTS_KEEP):
+        write_version(exercise, version)
+        exercise.take_snapshot(f'v{version}')
+    write_version(exercise, 99)
+
+    oldest = exercise.snapshots.list()[0]
+    assert exercise.restore(oldest['id'])
+    assert (exercise.path / 'main.py').read_text() == 'print(0)\n'
+    assert oldest['id'] in {snapshot['id'] for snapshot in exercise.snapshots.list()}
+
+
+def test_prune_keeps_objects_of_remaining_snapshots(exercise):
+    for version in range(settings.SNAPSHOTS_KEEP + 2):
+        write_version(exercise, version)
+        exercise.take_snapshot()
+
+    snapshots = exercise.snapshots.list()
+    assert len(snapshots) == settings.SNAPSHOTS_KEEP
+    used = {digest for snapshot in snapshots for digest in snapshot['files'].values()}
+    stored = {p.parent.name + p.name for p in exercise.snapshots.objects_dir.glob('*/*')}
+    assert stored == used
+
+
+def test_corrupted_object_is_not_restored(exercise):
+    write_version(exercise, 1)
+    manifest = exercise.take_snapshot()
+    write_version(exercise, 2)
+    exercise.snapshots.object_path(manifest['main.py']).write_bytes(b'corrupted')
+
+    first = exercise.snapshots.list()[0]
+    assert not exercise.restore(first['id'])
+    assert (exercise.path / 'main.py').read_text() == 'print(2)\n'
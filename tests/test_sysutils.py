@@ -0,0 +1,22 @@
+import zipfile
+
+import pytest
+
+from pypas.lib import sysutils
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_unzip_skips_unsafe_paths(tmp_path, workers):
+    zip_path = tmp_path / 'exercise.zip'
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('main.py', 'pass\n')
+        archive.writestr('docs/README.md', '# Hello\n')
+        archive.writestr('../outside.txt', 'unsafe')
+        archive.writestr('docs/../../outside-too.txt', 'unsafe')
+        archive.writestr(str(tmp_path / 'absolute.txt'), 'unsafe')
+    target = tmp_path / 'target'
+
+    assert sysutils.unzip(zip_path, target, workers, min_parallel_members=1) == target
+    assert (target / 'main.py').read_text() == 'pass\n'
+    assert (target / 'docs' / 'README.md').read_text() == '# Hello\n'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['exercise.zip', 'target']
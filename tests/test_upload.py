@@ -0,0 +1,114 @@
+import pytest
+
+from pypas import Exercise, settings
+
+pytest_plugins = ['pypas.lib.devserver']
+
+
+@pytest.fixture
+def token():
+    # Imported here: plugin modules must be imported by pytest (for assertion rewriting)
+    from pypas.lib.devserver import DEFAULT_TOKEN
+
+    return DEFAULT_TOKEN
+
+
+@pytest.fixture
+def exercise(pypas_server, tmp_path):
+    path = tmp_path / 'hello'
+    path.mkdir()
+    (path / settings.EXERCISE_CONFIG_FILE).write_text('slug = "hello"\n')
+    (path / 'main.py').write_text("print('Hello')\n")
+    (path / 'data.txt').write_text('data\n')
+    return Exercise('hello', path)
+
+
+def submitted(server, token: str, exercise: Exercise) -> bool:
+    """Whether server has exactly the current files of exercise."""
+    files = {f.as_posix(): (exercise.path / f).read_bytes() for f in exercise.zippable_files()}
+    return server.state.submissions.get((token, exercise.slug)) == files
+
+
+def test_first_upload_is_full(pypas_server, exercise, token):
+    assert exercise.upload(token)
+    assert pypas_server.handled == ['put_check', 'put_assignment']
+    assert submitted(pypas_server, token, exercise)
+
+
+def test_unchanged_exercise_is_not_uploaded_again(pypas_server, exercise, token):
+    assert exercise.upload(token)
+    assert exercise.upload(token)
+    assert pypas_server.handled == ['put_check', 'put_assignment', 'put_check']
+
+
+def test_changes_are_uploaded_as_delta(pypas_server, exercise, token):
+    assert exercise.upload(token)
+    (exercise.path / 'main.py').write_text("print('Bye')\n")
+    (exercise.path / 'data.txt').unlink()
+    pypas_server.handled.clear()
+    assert exercise.upload(token)
+    assert pypas_server.handled == ['put_check', 'put_delta']
+    assert submitted(pypas_server, token, exercise)
+
+
+def test_rejected_delta_falls_back_to_full_upload(pypas_server, exercise, token, monkeypatch):
+    assert exercise.upload(token)
+    (exercise.path / 'main.py').write_text("print('Bye')\n")
+    # Submission changes (i.e. from another computer) after the server accepted the delta
+    monkeypatch.setattr(Exercise, 'negotiate', lambda *args: (False, True))
+    pypas_server.state.submissions[(token, exercise.slug)]['other.py'] = b''
+    pypas_server.handled.clear()
+    assert exercise.upload(token)
+    assert pypas_server.handled == ['put_delta', 'put_assignment']
+    assert submitted(pypas_server, token, exercise)
+
+
+def test_server_without_delta_support(pypas_server, exercise, token):
+    pypas_server.disabled_endpoints = {'put_check', 'put_delta'}
+    assert exercise.upload(token)
+    (exercise.path / 'main.py').write_text("print('Bye')\n")
+    assert exercise.upload(token)
+    # Missing endpoints are only asked for once (no delta is ever sent)
+    assert pypas_server.handled == ['put_assignment', 'put_assignment']
+    assert pypas_server.requests_count == 3
+    assert submitted(pypas_server, token, exercise)
+
+
+@pytest.fixture
+def zipped(exercise, tmp_path, monkeypatch):
+    """Files written to any zipfile (which must not be left behind at temporary folder)."""
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    monkeypatch.setattr(settings, 'LARGE_FILE_SIZE', 512)
+    files = []
+    write_zip_member = Exercise.write_zip_member
+
+    def spy(self, archive, file, *args, **kwargs):
+        files.append(file.as_posix())
+        return write_zip_member(self, archive, file, *args, **kwargs)
+
+    monkeypatch.setattr(Exercise, 'write_zip_member', spy)
+    yield files
+    assert not list(tmp_path.glob('*.zip'))
+
+
+def test_large_file_is_not_uploaded(pypas_server, exercise, token, zipped):
+    (exercise.path / 'large.txt').write_bytes(b'x' * 1024)
+    assert not exercise.upload(token)
+    assert pypas_server.handled == []
+    assert not zipped
+    # Nor copied to snapshots
+    assert not exercise.snapshots.list()
+    assert (token, exercise.slug) not in pypas_server.state.submissions
+
+
+def test_large_delta_is_aborted(pypas_server, exercise, token, zipped):
+    assert exercise.upload(token)
+    for name in ('a.txt', 'b.txt'):
+        (exercise.path / name).write_bytes(b'x' * 300)
+    pypas_server.handled.clear()
+    zipped.clear()
+    assert not exercise.upload(token)
+    assert pypas_server.handled == ['put_check']
+    # Changes are known to be too large before compressing them
+    assert not zipped
+    assert 'a.txt' not in pypas_server.state.submissions[(token, exercise.slug)]